@@ -0,0 +1,125 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from carts.models import Cart, CartItem, InsufficientStock
+from restaurants.models import Menu, Restaurants
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Have several threads race to add one scarce menu item to their carts, "
+        "then check that no more units were reserved than were in stock and "
+        "report throughput. The seeded rows are deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--stock", type=int, default=100)
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=50,
+            help="Single-unit add-to-cart attempts per thread.",
+        )
+
+    def handle(self, *args, **options):
+        threads, stock = options["threads"], options["stock"]
+        owner, menu, carts = self.seed(threads, stock)
+        try:
+            counts = {"reserved": 0, "rejected": 0, "retries": 0}
+            lock = threading.Lock()
+            workers = [
+                threading.Thread(
+                    target=self.work,
+                    args=(cart, menu, options["attempts"], counts, lock),
+                )
+                for cart in carts
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+
+            menu.refresh_from_db(fields=["quantity"])
+            in_carts = sum(
+                CartItem.objects.filter(menu=menu).values_list("quantity", flat=True)
+            )
+        finally:
+            User.objects.filter(pk__in=[owner.pk, *(c.user_id for c in carts)]).delete()
+
+        attempts = counts["reserved"] + counts["rejected"]
+        self.stdout.write(
+            f"{threads} threads, {attempts} attempts on {stock} units in "
+            f"{elapsed:.2f} s ({attempts / elapsed:.0f} attempts/s)"
+        )
+        self.stdout.write(
+            f"reserved {counts['reserved']}, rejected {counts['rejected']}, "
+            f"lock retries {counts['retries']}, left in stock {menu.quantity}"
+        )
+        if (
+            counts["reserved"] > stock
+            or in_carts != counts["reserved"]
+            or menu.quantity != stock - in_carts
+        ):
+            raise CommandError(
+                f"Stock was oversold: {in_carts} units in carts, "
+                f"{menu.quantity} left of {stock}."
+            )
+        self.stdout.write(self.style.SUCCESS("No oversell."))
+
+    def seed(self, threads, stock):
+        owner = User.objects.create_user(
+            email="stress-stock@example.com",
+            first_name="Stress",
+            last_name="Owner",
+            role="owner",
+        )
+        restaurant = Restaurants.objects.create(
+            name="Stress", owner=owner, description="", address="", phone_number=""
+        )
+        menu = Menu.objects.create(
+            name="Last portion",
+            description="",
+            price=10,
+            quantity=stock,
+            restaurant=restaurant,
+        )
+        carts = [
+            Cart.objects.create(
+                user=User.objects.create_user(
+                    email=f"stress-stock-{i}@example.com",
+                    first_name="Stress",
+                    last_name="Customer",
+                )
+            )
+            for i in range(threads)
+        ]
+        return owner, menu, carts
+
+    def work(self, cart, menu, attempts, counts, lock):
+        try:
+            for _ in range(attempts):
+                outcome = self.attempt(cart, menu, counts, lock)
+                with lock:
+                    counts[outcome] += 1
+        finally:
+            connection.close()
+
+    def attempt(self, cart, menu, counts, lock):
+        while True:
+            try:
+                cart.add_item(menu, 1)
+                return "reserved"
+            except InsufficientStock:
+                return "rejected"
+            except OperationalError:
+                # SQLite gives up with "database is locked" when a writer
+                # could not get in before the busy timeout; try again.
+                with lock:
+                    counts["retries"] += 1
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from carts.models import release_expired_lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Release the stock held by cart lines older than CART_RESERVATION_TTL. "
+        "Works in small transactions so writers are never blocked for long; "
+        "with --loop it keeps running as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Cart lines released per transaction.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Seconds to wait between chunks, to let other writers in.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Sweep forever instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Seconds to sleep between passes with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        totals = {"lines": 0, "units": 0}
+        try:
+            while True:
+                lines, units = self.sweep(options["chunk_size"], options["pause"])
+                totals["lines"] += lines
+                totals["units"] += units
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        if options["loop"]:
+            self.stdout.write(
+                f"stopped: released {totals['lines']} lines, "
+                f"{totals['units']} units in total"
+            )
+
+    def sweep(self, chunk_size, pause):
+        start = time.perf_counter()
+        lines = units = chunks = 0
+        menu_updates = 0
+        while True:
+            released, freed, menu_items = release_expired_lines(chunk_size)
+            if released:
+                chunks += 1
+                lines += released
+                units += freed
+                menu_updates += menu_items
+            if released < chunk_size:
+                break
+            time.sleep(pause)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"released {lines} lines, {units} units in {chunks} chunks "
+            f"({menu_updates} menu updates) in {elapsed:.2f} s"
+        )
+        return lines, units
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 15:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carts", "0003_cart_menu_cart_quantity_alter_cart_total_price_and_more"),
+        ("restaurants", "0008_menu_restaurants_restaur_2e1372_idx_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cart",
+            index=models.Index(
+                fields=["user", "menu"], name="carts_cart_user_id_b82267_idx"
+            ),
+        ),
+    ]
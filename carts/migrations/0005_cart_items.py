@@ -0,0 +1,92 @@
+# Generated by Django 6.0 on 2026-10-18 15:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def move_lines_to_items(apps, schema_editor):
+    """
+    Turn each single-line cart into a cart with one item. Cart items hold
+    stock, which the old lines never took, so each line reserves what is
+    left of its menu item's stock, up to its quantity; lines with nothing
+    left to reserve are dropped.
+    """
+    Cart = apps.get_model("carts", "Cart")
+    CartItem = apps.get_model("carts", "CartItem")
+    Menu = apps.get_model("restaurants", "Menu")
+    for cart in Cart.objects.select_related("menu").order_by("id"):
+        menu = cart.menu
+        menu.refresh_from_db(fields=["quantity"])
+        quantity = min(cart.quantity, menu.quantity)
+        if quantity:
+            Menu.objects.filter(pk=menu.pk).update(quantity=F("quantity") - quantity)
+            CartItem.objects.create(
+                cart=cart, menu=menu, quantity=quantity, price=menu.price
+            )
+        cart.total_price = menu.price * quantity
+        cart.save(update_fields=["total_price"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carts", "0004_cart_carts_cart_user_id_b82267_idx"),
+        ("restaurants", "0008_menu_restaurants_restaur_2e1372_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField(default=1)),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("added_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="cartitem",
+            name="cart",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="items",
+                to="carts.cart",
+            ),
+        ),
+        migrations.AddField(
+            model_name="cartitem",
+            name="menu",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="restaurants.menu"
+            ),
+        ),
+        migrations.RunPython(move_lines_to_items, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="cart",
+            name="carts_cart_user_id_b82267_idx",
+        ),
+        migrations.RemoveField(
+            model_name="cart",
+            name="menu",
+        ),
+        migrations.RemoveField(
+            model_name="cart",
+            name="quantity",
+        ),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("cart", "menu"), name="unique_cart_item_per_menu"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("carts", "0005_cart_items"),
+        ("restaurants", "0008_menu_restaurants_restaur_2e1372_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cartitem",
+            index=models.Index(
+                fields=["updated_at", "id"], name="carts_carti_updated_e3ef3a_idx"
+            ),
+        ),
+    ]
@@ -1,26 +1,261 @@
-from django.db import models
+from collections import Counter
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, Value, When, Window
+from django.db.models.functions import Now
+from django.utils import timezone
 
 from restaurants.models import Menu
 from users.models import User
 
 
+class InsufficientStock(Exception):
+    """Raised when a menu item has fewer units left than were asked for."""
+
+
+def reserve_stock(menu_id, quantity):
+    """
+    Take ``quantity`` units of a menu item's stock for a cart.
+
+    The check and the decrement are one conditional ``UPDATE``, so two
+    customers racing for the last unit cannot both get it: whichever update
+    runs second matches no row and raises ``InsufficientStock``.
+    """
+    reserved = Menu.objects.filter(pk=menu_id, quantity__gte=quantity).update(
+        quantity=F("quantity") - quantity
+    )
+    if not reserved:
+        raise InsufficientStock(menu_id)
+
+
+def reserve_stock_many(quantities):
+    """
+    Reserve several menu items (``{menu_id: quantity}``) with one conditional
+    ``UPDATE ... CASE``. If any of them is short nothing is reserved and
+    ``InsufficientStock`` is raised.
+    """
+    wanted = Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+        output_field=models.PositiveIntegerField(),
+    )
+    with transaction.atomic():
+        reserved = Menu.objects.filter(pk__in=quantities, quantity__gte=wanted).update(
+            quantity=F("quantity") - wanted
+        )
+        if reserved != len(quantities):
+            raise InsufficientStock(*quantities)
+
+
+def release_stock(menu_id, quantity):
+    """Give units reserved by a cart back to the menu item."""
+    Menu.objects.filter(pk=menu_id).update(quantity=F("quantity") + quantity)
+
+
+def release_stock_many(quantities):
+    """
+    Give several menu items' units (``{menu_id: quantity}``) back with one
+    ``UPDATE ... CASE``.
+    """
+    released = Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+        output_field=models.PositiveIntegerField(),
+    )
+    Menu.objects.filter(pk__in=quantities).update(quantity=F("quantity") + released)
+
+
+def release_expired_lines(limit, now=None):
+    """
+    Delete up to ``limit`` cart lines untouched for ``CART_RESERVATION_TTL``
+    and give their units back, oldest first, in one short transaction: one
+    locking read, one DELETE, one UPDATE per menu item and one UPDATE for
+    the affected cart totals. Returns ``(lines, units, menu_items)`` freed.
+    """
+    cutoff = (now or timezone.now()) - settings.CART_RESERVATION_TTL
+    with transaction.atomic():
+        expired = list(
+            CartItem.objects.select_for_update(skip_locked=True)
+            .filter(updated_at__lt=cutoff)
+            .order_by("updated_at", "id")
+            .values_list("id", "cart_id", "menu_id", "quantity", "price")[:limit]
+        )
+        if not expired:
+            return 0, 0, 0
+
+        units, refunds = Counter(), Counter()
+        for _, cart_id, menu_id, quantity, price in expired:
+            units[menu_id] += quantity
+            refunds[cart_id] += price * quantity
+        CartItem.objects.filter(pk__in=[row[0] for row in expired]).delete()
+        for menu_id, quantity in units.items():
+            release_stock(menu_id, quantity)
+        refund_carts(refunds)
+    return len(expired), sum(units.values()), len(units)
+
+
+def refund_carts(refunds):
+    """
+    Take amounts (``{cart_id: amount}``) off several carts' totals with one
+    ``UPDATE ... CASE``, for lines removed behind the carts' backs.
+    """
+    refund = Case(
+        *(When(pk=pk, then=Value(amount)) for pk, amount in refunds.items()),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+    Cart.objects.filter(pk__in=refunds).update(
+        total_price=F("total_price") - refund, updated_at=Now()
+    )
+
+
 # Create your models here.
 class Cart(models.Model):
+    """
+    A user's cart. ``total_price`` is kept equal to the sum of its lines'
+    ``price * quantity`` by applying an SQL ``F()`` delta on every add,
+    change and removal, so reading it never touches the lines. Units in the
+    cart are reserved: they are taken off the menu item's stock when added
+    and given back when the line shrinks, is removed or expires.
+    """
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
-    quantity = models.PositiveIntegerField(default=1)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     added_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.user.username
+        return self.user.email
 
-    def cart_item_price(self):
-        return self.menu.price * self.quantity
+    def _apply_delta(self, delta):
+        Cart.objects.filter(pk=self.pk).update(
+            total_price=F("total_price") + delta, updated_at=Now()
+        )
+
+    def add_item(self, menu, quantity):
+        """Add ``quantity`` of ``menu``, merging with an existing line."""
+        with transaction.atomic():
+            reserve_stock(menu.pk, quantity)
+            item, created = CartItem.objects.get_or_create(
+                cart=self,
+                menu=menu,
+                defaults={"quantity": quantity, "price": menu.price},
+            )
+            if not created:
+                CartItem.objects.filter(pk=item.pk).update(
+                    quantity=F("quantity") + quantity, updated_at=Now()
+                )
+            self._apply_delta(item.price * quantity)
+            item.refresh_from_db(fields=["quantity"])
+        return item
+
+    def add_items(self, quantities):
+        """
+        Add ``quantities`` (``{menu_id: quantity}``) in one transaction with a
+        fixed number of queries, however many lines: a locking read of the
+        menu items, one stock UPDATE, one read of the lines already in the
+        cart, then one batched write each for new and merged lines.
+
+        Returns the ids of unknown menu items, or raises ``InsufficientStock``
+        naming the items that are short; either way nothing is written.
+        """
+        with transaction.atomic():
+            menus = (
+                Menu.objects.select_for_update()
+                .only("id", "price", "quantity")
+                .in_bulk(quantities)
+            )
+            missing = sorted(set(quantities) - set(menus))
+            if missing:
+                return missing
+            short = [pk for pk, n in quantities.items() if menus[pk].quantity < n]
+            if short:
+                raise InsufficientStock(*sorted(short))
+            reserve_stock_many(quantities)
+
+            lines = {
+                line.menu_id: line
+                for line in self.items.select_for_update().filter(menu__in=menus)
+            }
+            now = timezone.now()
+            for menu_id, line in lines.items():
+                line.quantity += quantities[menu_id]
+                line.updated_at = now
+            new_lines = [
+                CartItem(cart=self, menu_id=pk, quantity=n, price=menus[pk].price)
+                for pk, n in quantities.items()
+                if pk not in lines
+            ]
+            CartItem.objects.bulk_update(lines.values(), ["quantity", "updated_at"])
+            CartItem.objects.bulk_create(new_lines)
+            self._apply_delta(
+                sum(
+                    (lines[pk].price if pk in lines else menus[pk].price) * n
+                    for pk, n in quantities.items()
+                )
+            )
+        return []
+
+    def set_item_quantity(self, item, quantity):
+        with transaction.atomic():
+            locked = CartItem.objects.select_for_update().get(pk=item.pk, cart=self)
+            change = quantity - locked.quantity
+            if change > 0:
+                reserve_stock(locked.menu_id, change)
+            elif change < 0:
+                release_stock(locked.menu_id, -change)
+            CartItem.objects.filter(pk=item.pk).update(
+                quantity=quantity, updated_at=Now()
+            )
+            self._apply_delta(locked.price * change)
+        item.quantity = quantity
+        return item
+
+    def remove_item(self, item):
+        with transaction.atomic():
+            locked = CartItem.objects.select_for_update().get(pk=item.pk, cart=self)
+            locked.delete()
+            release_stock(locked.menu_id, locked.quantity)
+            self._apply_delta(-locked.cart_item_price())
 
     def calculate_total_price(self):
-        total = sum(item.cart_item_price() for item in self.items.all())
-        self.total_price = total
-        self.save()
+        """Recompute ``total_price`` from the lines, to repair drift."""
+        total = self.items.aggregate(total=Sum(F("price") * F("quantity")))["total"]
+        self.total_price = total or 0
+        self.save(update_fields=["total_price", "updated_at"])
         return self.total_price
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate every line with ``cart_total``, the sum of ``price * quantity``
+        over all selected lines, computed by the database as a window in the
+        same query that returns the lines.
+        """
+        return self.annotate(cart_total=Window(Sum(F("price") * F("quantity"))))
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
+    menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    # Unit price when the line was added; the cart total is built from it.
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    added_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "menu"], name="unique_cart_item_per_menu"
+            )
+        ]
+        # The reservation sweeper walks lines oldest first.
+        indexes = [models.Index(fields=["updated_at", "id"])]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.menu_id} in cart {self.cart_id}"
+
+    def cart_item_price(self):
+        return self.price * self.quantity
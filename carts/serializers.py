@@ -1,13 +1,31 @@
 from rest_framework import serializers
 
-from .models import Cart
+from .models import Cart, CartItem
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    line_total = serializers.DecimalField(
+        max_digits=10, decimal_places=2, source="cart_item_price", read_only=True
+    )
+
+    class Meta:
+        model = CartItem
+        fields = ["id", "menu", "quantity", "price", "line_total"]
+        read_only_fields = ["id", "price"]
+        extra_kwargs = {"quantity": {"min_value": 1}}
+
+
+class CartLineSerializer(serializers.Serializer):
+    """One ``{menu, quantity}`` line of a batch add-to-cart request."""
+
+    menu = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
 
 
 class CartSerializer(serializers.ModelSerializer):
+    items = CartItemSerializer(many=True, read_only=True)
+
     class Meta:
         model = Cart
-        fields = [
-            "menu",
-            "quantity",
-        ]
+        fields = ["items", "total_price", "added_at", "updated_at"]
         read_only_fields = ["total_price", "added_at", "updated_at"]
@@ -0,0 +1,24 @@
+from collections import Counter
+
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from restaurants.models import Menu
+
+from .models import CartItem, refund_carts
+
+
+@receiver(pre_delete, sender=Menu)
+def refund_deleted_menu_lines(sender, instance, **kwargs):
+    """
+    Deleting a menu item, or its restaurant, cascades to the cart lines
+    holding it without going through the cart; take them off the carts'
+    totals first, in the deleting transaction.
+    """
+    refunds = Counter()
+    for cart_id, price, quantity in CartItem.objects.filter(menu=instance).values_list(
+        "cart_id", "price", "quantity"
+    ):
+        refunds[cart_id] += price * quantity
+    if refunds:
+        refund_carts(refunds)
@@ -1,3 +1,338 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.generics import GenericAPIView
+from rest_framework.test import APITestCase
+
+from multi_restaurant_alx_captsone.testing import (
+    WITHOUT_SILK,
+    make_menu,
+    make_restaurant,
+    make_user,
+)
+from restaurants.models import Menu
+
+from .models import Cart, CartItem, InsufficientStock, release_expired_lines
+
+
+class CartTotalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer@example.com")
+        restaurant = make_restaurant(make_user("owner@example.com", role="owner"))
+        cls.jollof = make_menu(restaurant, "Jollof", price="12.50")
+        cls.waakye = make_menu(restaurant, "Waakye", price="8.00")
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+
+    def total(self):
+        self.cart.refresh_from_db()
+        return self.cart.total_price
+
+    def test_adding_merges_lines_and_moves_the_total(self):
+        self.cart.add_item(self.jollof, 2)
+        item = self.cart.add_item(self.jollof, 1)
+        self.cart.add_item(self.waakye, 1)
+        self.assertEqual(item.quantity, 3)
+        self.assertEqual(self.cart.items.count(), 2)
+        self.assertEqual(self.total(), Decimal("45.50"))
+
+    def test_changing_and_removing_lines_apply_deltas(self):
+        item = self.cart.add_item(self.jollof, 2)
+        other = self.cart.add_item(self.waakye, 3)
+        self.cart.set_item_quantity(item, 1)
+        self.assertEqual(self.total(), Decimal("36.50"))
+        self.cart.remove_item(other)
+        self.assertEqual(self.total(), Decimal("12.50"))
+
+    def test_lines_keep_the_price_they_were_added_at(self):
+        self.cart.add_item(self.jollof, 1)
+        Menu.objects.filter(pk=self.jollof.pk).update(price="99.00")
+        self.cart.add_item(self.jollof, 1)
+        self.assertEqual(self.total(), Decimal("25.00"))
+        self.assertEqual(self.cart.calculate_total_price(), Decimal("25.00"))
+
+    def test_total_updates_do_not_read_the_lines(self):
+        item = self.cart.add_item(self.jollof, 1)
+        with self.assertNumQueries(6):
+            # SAVEPOINT, locked line read, stock, line and total updates, RELEASE
+            self.cart.set_item_quantity(item, 4)
+        self.assertEqual(self.total(), Decimal("50.00"))
+
+
+class DeletedMenuItemTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = make_restaurant(make_user("owner@example.com", role="owner"))
+        cls.jollof = make_menu(cls.restaurant, "Jollof", price="10.00")
+        cls.waakye = make_menu(cls.restaurant, "Waakye", price="5.00")
+        cls.carts = [
+            Cart.objects.create(user=make_user(f"customer{i}@example.com"))
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        for cart in self.carts:
+            cart.add_items({self.jollof.id: 1, self.waakye.id: 2})
+
+    def totals(self):
+        return [Cart.objects.get(pk=cart.pk).total_price for cart in self.carts]
+
+    def test_deleting_a_menu_item_takes_its_lines_off_the_totals(self):
+        self.jollof.delete()
+        self.assertEqual(self.totals(), [Decimal("10.00")] * 2)
+        for cart in self.carts:
+            self.assertEqual(cart.calculate_total_price(), Decimal("10.00"))
+
+    def test_deleting_the_restaurant_empties_the_totals(self):
+        self.restaurant.delete()
+        self.assertEqual(self.totals(), [Decimal("0.00")] * 2)
+
+
+class StockReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer@example.com")
+        restaurant = make_restaurant(make_user("owner@example.com", role="owner"))
+        cls.menu = make_menu(restaurant, "Jollof", quantity=5)
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+
+    def stock(self):
+        self.menu.refresh_from_db(fields=["quantity"])
+        return self.menu.quantity
+
+    def test_cart_lines_hold_stock(self):
+        item = self.cart.add_item(self.menu, 2)
+        self.assertEqual(self.stock(), 3)
+        self.cart.set_item_quantity(item, 4)
+        self.assertEqual(self.stock(), 1)
+        self.cart.set_item_quantity(item, 1)
+        self.assertEqual(self.stock(), 4)
+        self.cart.remove_item(item)
+        self.assertEqual(self.stock(), 5)
+
+    def test_cannot_reserve_more_than_is_left(self):
+        item = self.cart.add_item(self.menu, 4)
+        with self.assertRaises(InsufficientStock):
+            self.cart.add_item(self.menu, 2)
+        with self.assertRaises(InsufficientStock):
+            self.cart.set_item_quantity(item, 6)
+        item.refresh_from_db()
+        self.cart.refresh_from_db()
+        self.assertEqual((item.quantity, self.stock()), (4, 1))
+        self.assertEqual(self.cart.total_price, Decimal("40.00"))
+
+
+class StockContentionTests(TransactionTestCase):
+    def test_concurrent_reservations_never_oversell(self):
+        out = StringIO()
+        call_command("stress_stock", threads=4, stock=20, attempts=10, stdout=out)
+        self.assertIn("reserved 20, rejected 20", out.getvalue())
+        self.assertFalse(Menu.objects.exists())
+
+
+class SweepCartsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        restaurant = make_restaurant(make_user("owner@example.com", role="owner"))
+        cls.jollof = make_menu(restaurant, "Jollof", price="12.50")
+        cls.waakye = make_menu(restaurant, "Waakye", price="8.00")
+
+    def fill_cart(self, email, age):
+        cart = Cart.objects.create(user=make_user(email))
+        cart.add_items({self.jollof.id: 2, self.waakye.id: 1})
+        cart.items.update(updated_at=timezone.now() - age)
+        return cart
+
+    def sweep(self, *args):
+        out = StringIO()
+        call_command("sweep_carts", *args, stdout=out)
+        return out.getvalue()
+
+    def test_expired_lines_give_their_stock_back(self):
+        stale = [
+            self.fill_cart(f"stale{i}@example.com", timedelta(hours=1))
+            for i in range(3)
+        ]
+        fresh = self.fill_cart("fresh@example.com", timedelta(minutes=1))
+
+        output = self.sweep("--chunk-size", "4", "--pause", "0")
+
+        self.assertIn("released 6 lines, 9 units in 2 chunks", output)
+        self.assertEqual(
+            dict(Menu.objects.values_list("name", "quantity")),
+            {"Jollof": 8, "Waakye": 9},
+        )
+        self.assertEqual(
+            list(CartItem.objects.values_list("cart", flat=True).distinct()), [fresh.pk]
+        )
+        for cart in stale:
+            cart.refresh_from_db()
+            self.assertEqual(cart.total_price, 0)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.total_price, Decimal("33.00"))
+
+    def test_each_chunk_updates_each_menu_item_once(self):
+        for i in range(3):
+            self.fill_cart(f"stale{i}@example.com", timedelta(hours=1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(release_expired_lines(10), (6, 9, 2))
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(release_expired_lines(10), (0, 0, 0))
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class CartApiTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer@example.com")
+        restaurant = make_restaurant(make_user("owner@example.com", role="owner"))
+        cls.jollof = make_menu(restaurant, "Jollof", price="12.50")
+        cls.waakye = make_menu(restaurant, "Waakye", price="8.00")
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def add(self, menu, quantity):
+        return self.client.post(
+            "/cart/api/", {"menu": menu.id, "quantity": quantity}, format="json"
+        )
+
+    def test_cart_holds_several_lines(self):
+        self.add(self.jollof, 2)
+        response = self.add(self.waakye, 1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["total_price"], Decimal("33.00"))
+
+        response = self.client.get("/cart/api/")
+        self.assertEqual(len(response.data["data"]), 2)
+        self.assertEqual(response.data["total_price"], Decimal("33.00"))
+
+    def test_listing_runs_one_query_however_many_lines(self):
+        self.add(self.jollof, 2)
+        with self.assertNumQueries(1):
+            response = self.client.get("/cart/api/")
+        self.assertEqual(response.data["total_price"], Decimal("25.00"))
+
+        self.add(self.waakye, 3)
+        with self.assertNumQueries(1):
+            response = self.client.get("/cart/api/")
+        self.assertEqual(response.data["total_price"], Decimal("49.00"))
+        self.assertEqual(
+            [line["line_total"] for line in response.data["data"]], ["25.00", "24.00"]
+        )
+
+    def test_update_and_delete_lines(self):
+        line = self.add(self.jollof, 2).data["data"]["id"]
+        self.add(self.waakye, 1)
+        response = self.client.patch(
+            f"/cart/api/{line}/", {"quantity": 4}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_price"], Decimal("58.00"))
+
+        response = self.client.delete(f"/cart/api/{line}/")
+        self.assertEqual(response.data["total_price"], Decimal("8.00"))
+        self.assertFalse(CartItem.objects.filter(pk=line).exists())
+
+    def test_lines_of_other_users_are_not_found(self):
+        line = self.add(self.jollof, 1).data["data"]["id"]
+        self.client.force_authenticate(make_user("other@example.com"))
+        self.assertEqual(self.client.get(f"/cart/api/{line}/").status_code, 404)
+
+    def test_each_verb_looks_the_line_up_once(self):
+        line = self.add(self.jollof, 2).data["data"]["id"]
+        url = f"/cart/api/{line}/"
+        # Beyond the lookup, PATCH and DELETE lock the line in a savepoint,
+        # move its stock and the cart total, then read the new total.
+        for method, queries, body in [
+            ("get", 1, None),
+            ("patch", 8, {"quantity": 3}),
+            ("delete", 8, None),
+        ]:
+            with (
+                self.subTest(method),
+                mock.patch.object(
+                    GenericAPIView,
+                    "get_object",
+                    autospec=True,
+                    side_effect=GenericAPIView.get_object,
+                ) as lookup,
+            ):
+                with self.assertNumQueries(queries):
+                    getattr(self.client, method)(url, body, format="json")
+                self.assertEqual(lookup.call_count, 1)
+
+    def test_adding_more_than_is_in_stock_is_rejected(self):
+        response = self.add(self.jollof, 11)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data["status"])
+        self.assertFalse(CartItem.objects.exists())
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class BatchAddToCartTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("customer@example.com")
+        restaurant = make_restaurant(make_user("owner@example.com", role="owner"))
+        cls.menus = [make_menu(restaurant, f"Dish {i}", price="5.00") for i in range(8)]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def post(self, lines):
+        return self.client.post("/cart/api/", lines, format="json")
+
+    def lines(self, count, quantity=1):
+        return [{"menu": m.id, "quantity": quantity} for m in self.menus[:count]]
+
+    def test_adds_and_merges_lines_in_one_request(self):
+        self.client.post(
+            "/cart/api/", {"menu": self.menus[0].id, "quantity": 1}, format="json"
+        )
+        response = self.post(self.lines(3, quantity=2) + [self.lines(1)[0]])
+        self.assertEqual(response.status_code, 201)
+        quantities = {line["menu"]: line["quantity"] for line in response.data["data"]}
+        self.assertEqual(quantities, {m.id: q for m, q in zip(self.menus, [4, 2, 2])})
+        self.assertEqual(response.data["total_price"], Decimal("40.00"))
+        self.menus[0].refresh_from_db()
+        self.assertEqual(self.menus[0].quantity, 6)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        Cart.objects.create(user=self.user)
+        counts = []
+        for count in (2, 8):
+            CartItem.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(self.lines(count)).status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_nothing_is_added_when_one_line_is_short(self):
+        lines = self.lines(3)
+        lines[1]["quantity"] = 11
+        response = self.post(lines)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"]["out_of_stock"], [self.menus[1].id])
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(
+            sorted(Menu.objects.values_list("quantity", flat=True).distinct()), [10]
+        )
+
+    def test_unknown_menu_items_are_reported(self):
+        response = self.post(self.lines(2) + [{"menu": 0}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"]["missing"], [0])
+        self.assertFalse(CartItem.objects.exists())
@@ -1,121 +1,169 @@
+from rest_framework import status
 from rest_framework.generics import (
     ListCreateAPIView,
     get_object_or_404,
     RetrieveUpdateDestroyAPIView,
 )
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-from carts.serializers import CartSerializer
+from carts.serializers import CartItemSerializer, CartLineSerializer
+from restaurants.mixins import CachedObjectMixin
 from restaurants.models import Menu
-from .models import Cart
+from .models import Cart, CartItem, InsufficientStock
+
+
+def cart_total(user):
+    """The maintained cart total: one single-row read, however many lines."""
+    total = Cart.objects.filter(user=user).values_list("total_price", flat=True)
+    return total.first() or 0
+
+
+def out_of_stock():
+    data = {
+        "msg": "Requested quantity exceeds available stock",
+        "status": False,
+    }
+    return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
 
 class CartCreateListView(ListCreateAPIView):
-    serializer_class = CartSerializer
-    queryset = Cart.objects.all()
+    """
+    POST takes either one ``{menu, quantity}`` line or a list of them. A list
+    is added in one transaction: every line is added, or none is.
+    """
 
-    def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+    serializer_class = CartItemSerializer
+    permission_classes = [IsAuthenticated]
+    max_lines = 100
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+    def get_queryset(self):
+        return CartItem.objects.filter(cart__user=self.request.user)
 
     def list(self, request, *args, **kwargs):
-        serializer = self.serializer_class(self.get_queryset(), many=True)
-        data = {"msg": "Your Cart Items", "data": serializer.data, "status": True}
+        # The lines and their grand total come back in a single query.
+        lines = list(self.get_queryset().with_totals())
+        serializer = self.get_serializer(lines, many=True)
+        data = {
+            "msg": "Your Cart Items",
+            "data": serializer.data,
+            "total_price": lines[0].cart_total if lines else 0,
+            "status": True,
+        }
         return Response(data, status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.create_many(request)
+
         menu = get_object_or_404(Menu, pk=request.data.get("menu"))
-        if menu.quantity < 1:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantity = serializer.validated_data.get("quantity", 1)
+
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        try:
+            item = cart.add_item(menu, quantity)
+        except InsufficientStock:
+            return out_of_stock()
+        serializer = self.get_serializer(item)
+
+        data = {
+            "msg": "Cart item added successfully",
+            "data": serializer.data,
+            "total_price": cart_total(request.user),
+            "status": True,
+        }
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def create_many(self, request):
+        if not request.data or len(request.data) > self.max_lines:
             data = {
-                "msg": "Menu item is out of stock",
+                "msg": f"Send between 1 and {self.max_lines} cart lines",
                 "status": False,
             }
             return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        quantity = serializer.validated_data.get("quantity", 1)
-
-        if int(quantity) > menu.quantity:
+        lines = CartLineSerializer(data=request.data, many=True)
+        lines.is_valid(raise_exception=True)
+        quantities = {}
+        for line in lines.validated_data:
+            quantities[line["menu"]] = (
+                quantities.get(line["menu"], 0) + line["quantity"]
+            )
+
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        try:
+            missing = cart.add_items(quantities)
+        except InsufficientStock as error:
             data = {
                 "msg": "Requested quantity exceeds available stock",
+                "data": {"out_of_stock": list(error.args)},
+                "status": False,
+            }
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        if missing:
+            data = {
+                "msg": "Some menu items do not exist",
+                "data": {"missing": missing},
                 "status": False,
             }
             return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
-        cart, created = Cart.objects.get_or_create(user=request.user, menu=menu)
-
-        if not created:
-            cart.quantity += quantity
-        else:
-            cart.quantity = quantity
-
-        cart.total_price = cart.calculate_total_price()
-        cart.save()
-
-        serializer = self.get_serializer(cart)
-
+        serializer = self.get_serializer(self.get_queryset(), many=True)
         data = {
-            "msg": "Cart item added successfully",
+            "msg": "Cart items added successfully",
             "data": serializer.data,
-            "total_price": cart.cart_item_price(),
+            "total_price": cart_total(request.user),
             "status": True,
         }
         return Response(data, status=status.HTTP_201_CREATED)
 
 
-class CartUpdateDeleteView(RetrieveUpdateDestroyAPIView):
-    serializer_class = CartSerializer
-    queryset = Cart.objects.all()
+class CartUpdateDeleteView(CachedObjectMixin, RetrieveUpdateDestroyAPIView):
+    serializer_class = CartItemSerializer
+    permission_classes = [IsAuthenticated]
 
-    def get_object(self):
-        pk = self.kwargs.get("pk", None)
-        user = self.request.user
-        cart = get_object_or_404(Cart, pk=pk, user=user)
-        return cart
+    def get_queryset(self):
+        return CartItem.objects.filter(cart__user=self.request.user).select_related(
+            "cart", "menu"
+        )
 
     def update(self, request, *args, **kwargs):
-        cart = self.get_object()
-        menu = cart.menu
-        quantity = request.data.get("quantity", cart.quantity)
-
-        if int(quantity) > menu.quantity:
-            data = {
-                "msg": "Requested quantity exceeds available stock",
-                "status": False,
-            }
-            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        item = self.get_object()
+        serializer = self.get_serializer(item, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        quantity = serializer.validated_data.get("quantity", item.quantity)
 
-        response = super().update(request, *args, **kwargs)
-        cart.total_price = cart.calculate_total_price()
-        cart.save()
+        try:
+            item.cart.set_item_quantity(item, quantity)
+        except InsufficientStock:
+            return out_of_stock()
 
         data = {
             "msg": "Cart item updated successfully",
-            "data": response.data,
-            "total_price": cart_item.cart_item_price(),
+            "data": self.get_serializer(item).data,
+            "total_price": cart_total(request.user),
             "status": True,
         }
         return Response(data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
-        cart = self.get_object()
-        super().destroy(request, *args, **kwargs)
+        item = self.get_object()
+        item.cart.remove_item(item)
         data = {
             "msg": "Cart item deleted successfully",
-            "total_price": cart.cart_item_price(),
+            "total_price": cart_total(request.user),
             "status": True,
         }
         return Response(data, status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
-        response = super().retrieve(request, *args, **kwargs)
-        cart = self.get_object()
+        item = self.get_object()
         data = {
             "msg": "Cart item retrieved successfully",
-            "data": response.data,
-            "total_price": cart.cart_item_price(),
+            "data": self.get_serializer(item).data,
+            "total_price": item.cart.total_price,
             "status": True,
         }
         return Response(data, status=status.HTTP_200_OK)
@@ -13,4 +13,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'multi_restaurant_alx_captsone.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Order status event streams are long-lived, so they are answered without
+# going through Django's request handler (see orders.events). Imported after
+# get_asgi_application(), which sets Django up.
+from orders.events import OrderStatusEvents  # noqa: E402
+
+application = OrderStatusEvents(django_application)
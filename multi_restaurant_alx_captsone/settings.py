@@ -89,6 +89,18 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# The menu cache versions live here, so every worker must share the backend;
+# point this at Redis or Memcached when running more than one process.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -153,3 +165,17 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
 }
+
+
+# Cart lines hold stock until they have gone this long without a change;
+# `manage.py sweep_carts` then gives the units back to the menu.
+CART_RESERVATION_TTL = timedelta(minutes=30)
+
+# How long a stored response answers retries of a request sent with the same
+# Idempotency-Key header.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# How long a request holds its Idempotency-Key while it runs. A retry may take
+# over a key whose holder has neither answered nor renewed it in that time,
+# e.g. because its worker died; keep it above the slowest request.
+IDEMPOTENCY_LOCK_TTL = timedelta(seconds=30)
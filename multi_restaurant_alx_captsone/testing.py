@@ -0,0 +1,93 @@
+"""
+Helpers shared by the apps' test suites and load-test commands.
+"""
+
+import asyncio
+from decimal import Decimal
+
+from django.conf import settings
+
+from restaurants.models import Menu, Restaurants
+from users.models import User
+
+# Silk records every request in the database, which would skew query counts.
+WITHOUT_SILK = [m for m in settings.MIDDLEWARE if not m.startswith("silk.")]
+
+
+def make_user(email, role="customer"):
+    return User.objects.create_user(
+        email=email, password="pass", first_name="Test", last_name="User", role=role
+    )
+
+
+def make_restaurant(owner, name="Restaurant"):
+    return Restaurants.objects.create(
+        name=name, owner=owner, description="", address="", phone_number=""
+    )
+
+
+def make_menu(restaurant, name="Dish", price="10.00", quantity=10, **kwargs):
+    kwargs.setdefault("description", "")
+    return Menu.objects.create(
+        name=name,
+        restaurant=restaurant,
+        price=Decimal(price),
+        quantity=quantity,
+        **kwargs,
+    )
+
+
+class Stream:
+    """One client connection, driven straight through the ASGI callable."""
+
+    def __init__(self, application, path, token, host):
+        self.application = application
+        path, _, query_string = path.partition("?")
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", host.encode()),
+                (b"authorization", f"Bearer {token}".encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": (host, 80),
+        }
+        self.status_code = None
+        self.body = ""
+        self.changed = asyncio.Event()
+        self.done = asyncio.Event()
+
+    async def open(self):
+        await self.application(self.scope, self.receive, self.send)
+
+    async def receive(self):
+        if not hasattr(self, "_requested"):
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a client that stays connected until the server closes.
+        await self.done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            self.body += message.get("body", b"").decode()
+            self.changed.set()
+            if not message.get("more_body", False):
+                self.done.set()
+
+    async def received(self, status):
+        while f'"status": "{status}"' not in self.body:
+            if self.done.is_set():
+                raise RuntimeError(f"stream closed early: {self.status_code}")
+            self.changed.clear()
+            await self.changed.wait()
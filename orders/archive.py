@@ -0,0 +1,67 @@
+"""
+Moving finished orders out of the hot ``Order``/``OrderItem`` tables.
+
+Completed and cancelled orders never change again, so once they are old
+enough they are copied to ``ArchivedOrder``/``ArchivedOrderItem`` and
+deleted from the hot tables, a bounded batch per transaction. A batch is
+all or nothing, and the hot table itself records what is left to do, so an
+interrupted run simply continues where it stopped when started again.
+"""
+
+from django.db import transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVED_STATUSES = ("COMPLETED", "CANCELLED")
+
+ORDER_FIELDS = [
+    "id",
+    "user_id",
+    "restaurant_id",
+    "order_date",
+    "status",
+    "total_amount",
+    "created_at",
+    "updated_at",
+]
+
+ORDER_ITEM_FIELDS = [
+    "id",
+    "order_id",
+    "menu_item_id",
+    "quantity",
+    "price",
+    "created_at",
+    "updated_at",
+]
+
+
+def archive_orders(cutoff, limit):
+    """
+    Move up to ``limit`` completed or cancelled orders placed before
+    ``cutoff``, oldest first, with their items, in one transaction: one
+    locking read of the orders, one read of their items, one batched INSERT
+    into each archive table and the DELETEs. Returns ``(orders, items)``
+    moved.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(status__in=ARCHIVED_STATUSES, order_date__lt=cutoff)
+            .order_by("order_date", "id")
+            .values(*ORDER_FIELDS)[:limit]
+        )
+        if not orders:
+            return 0, 0
+
+        ids = [order["id"] for order in orders]
+        items = list(
+            OrderItem.objects.filter(order_id__in=ids).values(*ORDER_ITEM_FIELDS)
+        )
+        ArchivedOrder.objects.bulk_create(ArchivedOrder(**order) for order in orders)
+        ArchivedOrderItem.objects.bulk_create(
+            ArchivedOrderItem(**item) for item in items
+        )
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(pk__in=ids).delete()
+    return len(orders), len(items)
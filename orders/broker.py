@@ -0,0 +1,66 @@
+"""
+In-process publish/subscribe for order status changes.
+
+Event-stream connections subscribe to one order and wait on an
+``asyncio.Queue``; publishers (order save hooks, which run in worker
+threads) hand events to each subscriber's event loop with
+``call_soon_threadsafe``. Nothing leaves the process, so every worker
+serves the changes made through it; run one worker, or put a shared
+channel (Redis, PostgreSQL LISTEN/NOTIFY) behind ``publish()``, when
+status changes can come through several.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    def __init__(self, order_id):
+        self.order_id = order_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        except RuntimeError:
+            # The subscriber's event loop has shut down.
+            pass
+
+
+class OrderStatusBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, order_id):
+        """Start receiving events for ``order_id``; call from async code."""
+        subscription = Subscription(order_id)
+        with self._lock:
+            self._subscriptions[order_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.order_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.order_id]
+
+    def publish(self, order_id, event):
+        """Send ``event`` to every subscriber of ``order_id``; thread-safe."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(order_id, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def subscriber_count(self, order_id=None):
+        with self._lock:
+            if order_id is not None:
+                return len(self._subscriptions.get(order_id, ()))
+            return sum(len(s) for s in self._subscriptions.values())
+
+
+broker = OrderStatusBroker()
@@ -0,0 +1,124 @@
+"""
+Turning a cart into orders.
+
+The cart lines already hold their stock (see ``carts.models``), so checkout
+only has to copy them into orders and clear them. A cart with dishes from
+several restaurants becomes one order per restaurant, each carrying its
+``restaurant`` so owners can find it directly. It is done in one
+transaction with a fixed number of queries, however many lines and
+restaurants the cart has.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from carts.models import Cart, CartItem, release_stock_many
+from restaurants.analytics import record_sales, remove_sales
+
+from .models import Order, OrderItem
+
+
+class EmptyCart(Exception):
+    """Raised when the user has nothing in their cart."""
+
+
+class CartChanged(Exception):
+    """Raised when cart lines disappeared while the order was being placed."""
+
+
+def place_order(user):
+    """
+    Create one order per restaurant from ``user``'s cart, empty the cart and
+    return the orders.
+
+    Queries: one read of the lines, one batched INSERT for the orders, one
+    for their items, one upsert into the daily sales rollups, one DELETE of
+    the lines and one UPDATE resetting the cart total. The DELETE claims the
+    lines: if a concurrent checkout or the reservation sweeper removed any
+    of them first, ``CartChanged`` is raised and nothing is written.
+    """
+    with transaction.atomic():
+        lines = list(
+            CartItem.objects.filter(cart__user=user)
+            .annotate(restaurant_id=F("menu__restaurant_id"))
+            .order_by("id")
+        )
+        if not lines:
+            raise EmptyCart
+
+        by_restaurant = defaultdict(list)
+        for line in lines:
+            by_restaurant[line.restaurant_id].append(line)
+        orders = Order.objects.bulk_create(
+            Order(
+                user=user,
+                restaurant_id=restaurant_id,
+                status="PENDING",
+                total_amount=sum(line.cart_item_price() for line in restaurant_lines),
+            )
+            for restaurant_id, restaurant_lines in by_restaurant.items()
+        )
+        order_for = {order.restaurant_id: order for order in orders}
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order_for[line.restaurant_id],
+                menu_item_id=line.menu_id,
+                quantity=line.quantity,
+                price=line.cart_item_price(),
+            )
+            for line in lines
+        )
+        day = timezone.localdate(orders[0].order_date)
+        record_sales(
+            (
+                line.restaurant_id,
+                line.menu_id,
+                day,
+                1,
+                line.quantity,
+                line.cart_item_price(),
+            )
+            for line in lines
+        )
+
+        deleted, _ = CartItem.objects.filter(
+            pk__in=[line.pk for line in lines]
+        ).delete()
+        if deleted != len(lines):
+            raise CartChanged
+        Cart.objects.filter(user=user).update(total_price=0, updated_at=Now())
+    return orders
+
+
+def release_order(order_id):
+    """
+    Give an order's units back to the menu and take its lines out of the
+    daily sales rollups. Call it in the transaction that cancels or deletes
+    the order, which must not already be cancelled.
+
+    Queries: one read of the items, one ``UPDATE ... CASE`` of the menu
+    items' stock and one of the rollups.
+    """
+    items = list(
+        OrderItem.objects.filter(order_id=order_id).values_list(
+            "menu_item__restaurant_id",
+            "menu_item_id",
+            "order__order_date",
+            "quantity",
+            "price",
+        )
+    )
+    if not items:
+        return
+    units = defaultdict(int)
+    for _, menu_item_id, _, quantity, _ in items:
+        units[menu_item_id] += quantity
+    release_stock_many(units)
+    remove_sales(
+        (restaurant_id, menu_item_id, timezone.localdate(ordered), 1, quantity, price)
+        for restaurant_id, menu_item_id, ordered, quantity, price in items
+    )
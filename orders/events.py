@@ -0,0 +1,150 @@
+"""
+Server-sent events for order status, answered by the ASGI application.
+
+``GET /orders/api/<pk>/events/`` streams the status of one of the user's
+orders: the current status first, then every change the order broker
+publishes, ending once the order is completed or cancelled.
+
+These requests are served here rather than by a Django view. Django's
+request handler keeps a dedicated thread for each request until its
+response has been sent, which for a stream that stays open for minutes
+means one idle thread per connection. Here an idle stream is a suspended
+coroutine. The only blocking work, checking the JWT and reading the
+order's status, runs once per connection on the shared thread pool and
+gives its database connection back straight away.
+"""
+
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .broker import broker
+from .models import Order
+
+EVENTS_PATH = re.compile(r"^/orders/api/(?P<pk>[0-9]+)/events/$")
+FINAL_STATUSES = {"COMPLETED", "CANCELLED"}
+HEARTBEAT_SECONDS = 15
+
+
+def find_order_status(authorization, pk):
+    """The status of the token owner's order ``pk``, or None."""
+    try:
+        authentication = JWTAuthentication()
+        raw_token = authentication.get_raw_token(authorization or b"")
+        if raw_token is None:
+            raise AuthenticationFailed
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+        return (
+            Order.objects.filter(pk=pk, user=user)
+            .values_list("status", flat=True)
+            .first()
+        )
+    finally:
+        connection.close()
+
+
+def server_sent_event(event):
+    return f"event: status\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def send_json(send, status, body):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+class OrderStatusEvents:
+    """
+    ASGI middleware answering order status event streams itself and passing
+    every other request on to ``application``.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        match = scope["type"] == "http" and EVENTS_PATH.match(scope["path"])
+        if not match:
+            return await self.application(scope, receive, send)
+        if scope["method"] != "GET":
+            return await send_json(
+                send, 405, {"msg": "Method not allowed.", "status": False}
+            )
+        await self.stream(scope, receive, send, int(match["pk"]))
+
+    async def stream(self, scope, receive, send, pk):
+        # Subscribe before reading the status, so no change can slip between.
+        subscription = broker.subscribe(pk)
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            try:
+                order_status = await sync_to_async(
+                    find_order_status, thread_sensitive=False
+                )(dict(scope["headers"]).get(b"authorization"), pk)
+            except AuthenticationFailed:
+                return await send_json(
+                    send,
+                    401,
+                    {
+                        "msg": "Authentication credentials were not provided "
+                        "or are invalid.",
+                        "status": False,
+                    },
+                )
+            if order_status is None:
+                return await send_json(
+                    send, 404, {"msg": "Order not found.", "status": False}
+                )
+
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            event = {"id": pk, "status": order_status}
+            await self.send_body(send, server_sent_event(event))
+            while event["status"] not in FINAL_STATUSES:
+                update = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {update, disconnected},
+                    timeout=HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    update.cancel()
+                    return
+                if update not in done:
+                    update.cancel()
+                    # Comments keep proxies from closing an idle connection.
+                    await self.send_body(send, b": keep-alive\n\n")
+                elif update.result()["status"] != event["status"]:
+                    event = update.result()
+                    await self.send_body(send, server_sent_event(event))
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            broker.unsubscribe(subscription)
+
+    async def send_body(self, send, body):
+        await send({"type": "http.response.body", "body": body, "more_body": True})
@@ -0,0 +1,157 @@
+"""
+Streaming export of order history as CSV or NDJSON.
+
+``GET /orders/api/export/?format=csv|ndjson`` writes one line per ordered
+item, from the hot tables and then the archive. Customers get their own
+orders, owners the orders placed with their restaurants.
+
+Rows are read with ``iterator(chunk_size=...)``, which uses a server-side
+cursor where the database has them, and written out a chunk at a time
+through a ``StreamingHttpResponse``. Memory stays the same however many
+rows there are, and the first bytes leave as soon as the first chunk is
+read. Under ASGI, Django would turn a synchronous iterator into a list
+before sending any of it, so there the chunks are pulled one at a time
+through an async iterator instead (``iterate_in_thread``).
+
+This is a plain Django view: DRF reads ``?format=`` as a renderer override,
+so it checks the JWT itself.
+"""
+
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from restaurants.bulk import batched
+from restaurants.models import Restaurants
+
+from .models import ArchivedOrderItem, OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = {
+    "order_id": "order_id",
+    "order_date": "order__order_date",
+    "status": "order__status",
+    "restaurant_id": "order__restaurant_id",
+    "customer_id": "order__user_id",
+    "item_id": "id",
+    "menu_item_id": "menu_item_id",
+    "menu_item": "menu_item__name",
+    "quantity": "quantity",
+    "price": "price",
+}
+
+
+class Echo:
+    """A file-like object handing back what is written, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Every item of the orders ``user`` may export, hot tables first. Rows
+    come in the order the order indexes are read in, by date for a customer
+    and by restaurant for an owner, so the database never has to sort the
+    whole export before sending the first row.
+    """
+    if user.role == "owner":
+        scope = {"order__restaurant__in": Restaurants.objects.filter(owner=user)}
+        ordering = ["order__restaurant_id"]
+    else:
+        scope = {"order__user": user}
+        ordering = ["order__order_date", "order_id", "id"]
+    for model in (OrderItem, ArchivedOrderItem):
+        yield from (
+            model.objects.filter(**scope)
+            .order_by(*ordering)
+            .values_list(*EXPORT_COLUMNS.values())
+            .iterator(chunk_size=chunk_size)
+        )
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for batch in batched(rows, EXPORT_CHUNK_SIZE):
+        yield "".join(writer.writerow(row) for row in batch)
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder()
+    for batch in batched(rows, EXPORT_CHUNK_SIZE):
+        yield "".join(
+            encoder.encode(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch
+        )
+
+
+async def iterate_in_thread(lines):
+    """
+    Yield the chunks of the synchronous iterator ``lines`` to an ASGI
+    response one at a time. Each is made on one dedicated thread, which
+    holds the export's database cursor from the first chunk to the last and
+    closes its connection at the end, without tying up the thread that
+    runs sync views.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-export")
+    in_thread = sync_to_async(thread_sensitive=False, executor=executor)
+    try:
+        while (chunk := await in_thread(next)(lines, None)) is not None:
+            yield chunk
+    finally:
+        await in_thread(close_lines)(lines)
+        executor.shutdown(wait=False)
+
+
+def close_lines(lines):
+    lines.close()
+    connection.close()
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", csv_lines),
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+}
+
+
+def authenticate(request):
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+@require_GET
+def export_orders(request):
+    user = authenticate(request)
+    if user is None:
+        return JsonResponse(
+            {
+                "msg": "Authentication credentials were not provided or are invalid.",
+                "status": False,
+            },
+            status=401,
+        )
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse(
+            {"msg": "format must be csv or ndjson.", "status": False}, status=400
+        )
+
+    content_type, lines = EXPORT_FORMATS[export_format]
+    content = lines(export_rows(user))
+    if isinstance(request, ASGIRequest):
+        content = iterate_in_thread(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="orders.{export_format}"'
+    return response
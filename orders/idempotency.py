@@ -0,0 +1,128 @@
+"""
+``Idempotency-Key`` support for POST endpoints.
+
+A client that retries a timed-out POST with the same key gets the first
+attempt's response back instead of running the request again. Keys are
+scoped to the user and kept for ``IDEMPOTENCY_KEY_TTL``. While the first
+request runs it holds the key for ``IDEMPOTENCY_LOCK_TTL``; if it dies
+without answering, a retry takes the key over once that lease runs out.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+def claim_key(user, key):
+    """
+    Try to take ``key`` for this request. Returns ``(record, True)`` when
+    this request should run, or ``(record, False)`` with the row of an
+    earlier request using the same key. Expired rows are replaced, and an
+    unanswered row whose lease has run out is taken over.
+    """
+    for _ in range(2):
+        now = timezone.now()
+        locked_until = now + settings.IDEMPOTENCY_LOCK_TTL
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                    locked_until=locked_until,
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is not None and record.expires_at > now:
+                if record.status_code is None and (
+                    record.locked_until is None or record.locked_until <= now
+                ):
+                    # Only one of several concurrent retries wins the lease.
+                    taken = IdempotencyKey.objects.filter(
+                        pk=record.pk,
+                        status_code__isnull=True,
+                        locked_until=record.locked_until,
+                    ).update(locked_until=locked_until)
+                    if taken:
+                        record.locked_until = locked_until
+                        return record, True
+                return record, False
+            IdempotencyKey.objects.filter(
+                user=user, key=key, expires_at__lte=now
+            ).delete()
+    return record, False
+
+
+class IdempotentCreateMixin:
+    """
+    Honours an ``Idempotency-Key`` header on POST.
+
+    The first request with a key runs and its response is stored. A replay
+    returns the stored response with an ``Idempotent-Replayed`` header and
+    runs nothing. A duplicate that arrives while the first is still running
+    waits up to ``idempotency_wait`` seconds for it, then gets a 409; one
+    that arrives after the first request's lease has run out runs instead.
+    Conflicts and errors are not stored, so the client can retry them.
+    """
+
+    idempotency_wait = 5
+    idempotency_poll_interval = 0.1
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return super().post(request, *args, **kwargs)
+        if not key or len(key) > 255:
+            return Response(
+                {"msg": "Idempotency-Key must be 1 to 255 characters", "status": False},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        record, claimed = claim_key(request.user, key)
+        if not claimed:
+            return self.replay(record)
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code == status.HTTP_409_CONFLICT or status.is_server_error(
+            response.status_code
+        ):
+            record.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code, response=response.data
+            )
+        return response
+
+    def replay(self, record):
+        deadline = time.monotonic() + self.idempotency_wait
+        while record is not None and record.status_code is None:
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.idempotency_poll_interval)
+            record = IdempotencyKey.objects.filter(pk=record.pk).first()
+
+        if record is None or record.status_code is None:
+            return Response(
+                {
+                    "msg": "A request with this Idempotency-Key is still being "
+                    "processed, retry later.",
+                    "status": False,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            record.response,
+            status=record.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from carts.models import Cart
+from orders.checkout import place_order
+from restaurants.models import Menu, Restaurants
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time checkout against cart size on throwaway data and count its "
+        "queries. Everything is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1, 5, 10, 25, 50, 100, 200],
+            help="Cart sizes (number of lines) to measure.",
+        )
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes, runs = options["sizes"], options["runs"]
+        with transaction.atomic():
+            user, menu_ids = self.seed(max(sizes))
+            cart = Cart.objects.create(user=user)
+            self.stdout.write(
+                f"{'lines':>6} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8}"
+            )
+            for size in sizes:
+                timings, queries = [], set()
+                for _ in range(runs):
+                    cart.add_items({pk: 1 for pk in menu_ids[:size]})
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        place_order(user)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    queries.add(len(captured))
+                self.report(size, sorted(timings), queries)
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        owner = User.objects.create_user(
+            email="benchmark-checkout-owner@example.com",
+            first_name="Benchmark",
+            last_name="Owner",
+            role="owner",
+        )
+        restaurant = Restaurants.objects.create(
+            name="Benchmark", owner=owner, description="", address="", phone_number=""
+        )
+        menus = Menu.objects.bulk_create(
+            Menu(
+                name=f"Dish {i}",
+                description="",
+                price=10,
+                quantity=1_000_000,
+                restaurant=restaurant,
+            )
+            for i in range(count)
+        )
+        customer = User.objects.create_user(
+            email="benchmark-checkout@example.com",
+            first_name="Benchmark",
+            last_name="Customer",
+        )
+        return customer, [menu.pk for menu in menus]
+
+    def report(self, size, timings, queries):
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        counts = "/".join(map(str, sorted(queries)))
+        self.stdout.write(f"{size:>6} {p50:>8.2f} {p95:>8.2f} {counts:>8}")
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from multi_restaurant_alx_captsone.asgi import application
+from multi_restaurant_alx_captsone.testing import Stream
+from orders.broker import broker
+from orders.models import Order
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many idle order-status event streams against the ASGI "
+        "application in this process, then change the order's status and "
+        "time how long it takes to reach every stream. Reports threads, "
+        "memory per connection and fan-out latency. The seeded rows are "
+        "deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=2000)
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="Host header to send, for requests that reach Django.",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(
+            email="loadtest-events@example.com",
+            first_name="Load",
+            last_name="Test",
+        )
+        try:
+            order = Order.objects.create(user=user, status="PENDING", total_amount=10)
+            token = str(AccessToken.for_user(user))
+            asyncio.run(self.run(order, token, options["connections"], options["host"]))
+        finally:
+            user.delete()
+
+    async def run(self, order, token, count, host):
+        streams = [
+            Stream(application, f"/orders/api/{order.pk}/events/", token, host)
+            for _ in range(count)
+        ]
+        threads_before = threading.active_count()
+        tracemalloc.start()
+
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(stream.open()) for stream in streams]
+        await asyncio.gather(*(stream.received("PENDING") for stream in streams))
+        connect = time.perf_counter() - start
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        idle_threads = threading.active_count()
+
+        self.stdout.write(
+            f"{count} streams open in {connect:.2f} s; "
+            f"{broker.subscriber_count(order.pk)} subscribed"
+        )
+        self.stdout.write(
+            f"threads: {threads_before} before, {idle_threads} with every "
+            f"stream idle; ~{memory / count / 1024:.1f} KiB per stream"
+        )
+
+        for new_status in ("PROCESSING", "COMPLETED"):
+            order.status = new_status
+            start = time.perf_counter()
+            await sync_to_async(order.save)(update_fields=["status", "updated_at"])
+            await asyncio.gather(*(stream.received(new_status) for stream in streams))
+            self.stdout.write(
+                f"{new_status} reached {count} streams in "
+                f"{(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+
+        await asyncio.gather(*tasks)
+        ok = sum(stream.status_code == 200 for stream in streams)
+        self.stdout.write(
+            f"{ok}/{count} streams answered 200 and closed after COMPLETED; "
+            f"{broker.subscriber_count(order.pk)} still subscribed"
+        )
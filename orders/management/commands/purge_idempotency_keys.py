@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses whose TTL has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        now, purged = timezone.now(), 0
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now).values_list(
+                    "pk", flat=True
+                )[: options["chunk_size"]]
+            )
+            if not ids:
+                break
+            purged += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(f"purged {purged} idempotency keys")
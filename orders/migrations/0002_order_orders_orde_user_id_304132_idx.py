@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 15:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-order_date"], name="orders_orde_user_id_304132_idx"
+            ),
+        ),
+    ]
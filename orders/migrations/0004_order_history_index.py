@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 15:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_idempotencykey"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="order",
+            name="orders_orde_user_id_304132_idx",
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "order_date", "id"],
+                name="orders_orde_user_id_039fad_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 6.0 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def route_existing_orders(apps, schema_editor):
+    """
+    Give orders placed before checkout split carts their restaurant, where
+    all their items come from one. Orders spanning several keep none.
+    """
+    Order = apps.get_model("orders", "Order")
+    single = (
+        Order.objects.annotate(
+            restaurants=Count("order_items__menu_item__restaurant", distinct=True),
+            routed_to=Max("order_items__menu_item__restaurant"),
+        )
+        .filter(restaurants=1)
+        .values_list("routed_to", "pk")
+    )
+    by_restaurant = {}
+    for restaurant_id, pk in single.iterator():
+        by_restaurant.setdefault(restaurant_id, []).append(pk)
+    for restaurant_id, pks in by_restaurant.items():
+        for start in range(0, len(pks), 500):
+            Order.objects.filter(pk__in=pks[start : start + 500]).update(
+                restaurant_id=restaurant_id
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_order_history_index"),
+        ("restaurants", "0009_dailysales"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="restaurant",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="orders",
+                to="restaurants.restaurants",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["restaurant", "status", "order_date", "id"],
+                name="orders_orde_restaur_2eea01_idx",
+            ),
+        ),
+        migrations.RunPython(route_existing_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0006_order_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="locked_until",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
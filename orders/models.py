@@ -1,9 +1,9 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-from restaurants.models import Menu
+from restaurants.models import Menu, Restaurants
 from users.models import User
 
-
 # Create your models here.
 
 
@@ -15,6 +15,15 @@ class Order(models.Model):
         ("CANCELLED", "Cancelled"),
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
+    # Checkout places one order per restaurant in the cart, so every order
+    # can be routed to its kitchen without going through the items.
+    restaurant = models.ForeignKey(
+        Restaurants,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="orders",
+    )
     order_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=50, choices=ORDERCHOICES)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -26,6 +35,11 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-order_date"]
+        indexes = [
+            models.Index(fields=["user", "order_date", "id"]),
+            # The owners' incoming queue: one restaurant, one status, oldest first.
+            models.Index(fields=["restaurant", "status", "order_date", "id"]),
+        ]
 
 
 class OrderItem(models.Model):
@@ -42,3 +56,84 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} of {self.menu_item.name} in Order {self.order.id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The outcome of a request sent with an ``Idempotency-Key`` header.
+
+    The row is created, and committed, before the request runs, so a
+    concurrent duplicate finds it; ``status_code`` and ``response`` are
+    filled in once the first request has finished. Until then the request
+    holds the key only until ``locked_until``.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    locked_until = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_idempotency_key_per_user"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.key} for user {self.user_id}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A completed or cancelled order moved out of ``Order`` by
+    ``manage.py archive_orders``, keeping its id and timestamps. The hot
+    tables then only hold recent and open orders; history reads merge both.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_orders"
+    )
+    restaurant = models.ForeignKey(
+        Restaurants,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_orders",
+    )
+    order_date = models.DateTimeField()
+    status = models.CharField(max_length=50, choices=Order.ORDERCHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived order {self.id} by {self.user_id}"
+
+    class Meta:
+        ordering = ["-order_date"]
+        indexes = [models.Index(fields=["user", "order_date", "id"])]
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder, on_delete=models.CASCADE, related_name="order_items"
+    )
+    menu_item = models.ForeignKey(
+        Menu, on_delete=models.CASCADE, related_name="archived_order_items"
+    )
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return (
+            f"{self.quantity} of {self.menu_item_id} in archived order {self.order_id}"
+        )
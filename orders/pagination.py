@@ -0,0 +1,16 @@
+from restaurants.pagination import KeysetCursorPagination
+
+
+class OrderHistoryPagination(KeysetCursorPagination):
+    """Newest orders first, keyed on ``(order_date, id)``, in fixed pages."""
+
+    timestamp_field = "order_date"
+    page_size_query_param = None
+
+
+class IncomingOrderPagination(KeysetCursorPagination):
+    """Oldest orders first, so a kitchen works through its queue in order."""
+
+    timestamp_field = "order_date"
+    descending = False
+    page_size = 50
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from .models import Order, OrderItem
+from .transitions import TRANSITIONS
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -16,6 +17,8 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = [
+            "id",
+            "restaurant",
             "order_date",
             "status",
             "total_amount",
@@ -23,4 +26,37 @@ class OrderSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["updated_at", "created_at", "status", "total_amount"]
+        read_only_fields = [
+            "id",
+            "restaurant",
+            "updated_at",
+            "created_at",
+            "status",
+            "total_amount",
+        ]
+
+    def update(self, instance, validated_data):
+        # Write only the fields sent, never a status read earlier: that
+        # changes through the state machine alone.
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, "updated_at"])
+        return instance
+
+
+class OrderStatusSerializer(serializers.Serializer):
+    """
+    A compare-and-set status change: ``expected_status`` is the status the
+    client last saw, ``status`` the one it wants.
+    """
+
+    expected_status = serializers.ChoiceField(choices=Order.ORDERCHOICES)
+    status = serializers.ChoiceField(choices=Order.ORDERCHOICES)
+
+    def validate(self, attrs):
+        if attrs["status"] not in TRANSITIONS[attrs["expected_status"]]:
+            raise serializers.ValidationError(
+                f"An order cannot go from {attrs['expected_status']} "
+                f"to {attrs['status']}."
+            )
+        return attrs
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .broker import broker
+from .models import Order
+
+
+def publish_status(order_id, order_status):
+    """Tell event-stream subscribers about a status, once it is committed."""
+    event = {"id": order_id, "status": order_status}
+    transaction.on_commit(lambda: broker.publish(order_id, event))
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "status" not in update_fields:
+        return
+    publish_status(instance.pk, instance.status)
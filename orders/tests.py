@@ -1,3 +1,715 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.generics import GenericAPIView
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from carts.models import Cart, CartItem
+from multi_restaurant_alx_captsone.asgi import application
+from multi_restaurant_alx_captsone.testing import (
+    WITHOUT_SILK,
+    Stream,
+    make_menu,
+    make_restaurant,
+    make_user,
+)
+from restaurants.models import DailySales, Menu, Restaurants
+
+from .broker import broker
+from .archive import archive_orders
+from .models import ArchivedOrder, IdempotencyKey, Order, OrderItem
+from .views import OrderCreateView
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class OrderConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer@example.com")
+        cls.order = Order.objects.create(
+            user=cls.customer, status="PENDING", total_amount="20.00"
+        )
+        cls.url = f"/orders/api/{cls.order.id}/"
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def test_unchanged_order_returns_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_status_change_invalidates_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.order.status = "PROCESSING"
+        self.order.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["status"], "PROCESSING")
+
+    def test_each_verb_looks_the_order_up_once(self):
+        # Beyond the lookup: GET reads the ETag validators and the items,
+        # PATCH saves and renders the items. DELETE, in a savepoint, reads
+        # the items to give back, then collects and deletes them and the
+        # order (an order without items releases nothing).
+        for method, queries in [("get", 3), ("patch", 3), ("delete", 7)]:
+            with (
+                self.subTest(method),
+                mock.patch.object(
+                    GenericAPIView,
+                    "get_object",
+                    autospec=True,
+                    side_effect=GenericAPIView.get_object,
+                ) as lookup,
+            ):
+                with self.assertNumQueries(queries):
+                    getattr(self.client, method)(self.url, {}, format="json")
+                self.assertEqual(lookup.call_count, 1)
+
+    def test_other_users_orders_are_not_found(self):
+        self.client.force_authenticate(make_user("other@example.com"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class CheckoutTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer@example.com")
+        owner = make_user("owner@example.com", role="owner")
+        cls.restaurants = [
+            make_restaurant(owner, name) for name in ("Buka", "Mama Put")
+        ]
+        # Three dishes from each restaurant.
+        cls.menus = [
+            make_menu(cls.restaurants[i // 3], f"Dish {i}", price=Decimal("5.00") + i)
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def fill_cart(self, count):
+        cart, _ = Cart.objects.get_or_create(user=self.customer)
+        cart.add_items({menu.id: 2 for menu in self.menus[:count]})
+
+    def checkout(self):
+        return self.client.post("/orders/api/")
+
+
+class CheckoutTests(CheckoutTestCase):
+    def test_checkout_turns_the_cart_into_an_order(self):
+        self.fill_cart(2)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(user=self.customer)
+        self.assertEqual(order.restaurant, self.restaurants[0])
+        self.assertEqual(order.total_amount, Decimal("22.00"))
+        self.assertEqual(
+            sorted(order.order_items.values_list("menu_item", "quantity", "price")),
+            [
+                (self.menus[0].id, 2, Decimal("10.00")),
+                (self.menus[1].id, 2, Decimal("12.00")),
+            ],
+        )
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_cart_is_split_into_one_order_per_restaurant(self):
+        self.fill_cart(4)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["data"]), 2)
+        orders = Order.objects.filter(user=self.customer).order_by("restaurant")
+        self.assertEqual(
+            [(o.restaurant, o.total_amount) for o in orders],
+            [
+                (self.restaurants[0], Decimal("36.00")),
+                (self.restaurants[1], Decimal("16.00")),
+            ],
+        )
+        self.assertEqual(
+            sorted(orders[1].order_items.values_list("menu_item", flat=True)),
+            [self.menus[3].id],
+        )
+
+    def test_empty_cart_cannot_be_checked_out(self):
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_lines_lost_to_a_concurrent_checkout_abort_the_order(self):
+        self.fill_cart(2)
+        with mock.patch.object(QuerySet, "delete", return_value=(1, {})):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        # One line from one restaurant, then six lines from two.
+        for count in (1, 6):
+            self.fill_cart(count)
+            # Read the lines, insert the orders and their items, add to the
+            # sales rollups, delete the lines, reset the total, inside a
+            # savepoint; then render the items.
+            with self.assertNumQueries(9):
+                self.assertEqual(self.checkout().status_code, 201)
+
+
+class IdempotentCheckoutTests(CheckoutTestCase):
+    def checkout(self, key="retry-1"):
+        return self.client.post("/orders/api/", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_the_first_response_without_a_new_order(self):
+        self.fill_cart(2)
+        first = self.checkout()
+        self.fill_cart(1)
+        with self.assertNumQueries(5):
+            # The failed claim and its savepoint, then the stored response.
+            replay = self.checkout()
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(CartItem.objects.count(), 1)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.fill_cart(1)
+        self.checkout()
+        self.client.force_authenticate(make_user("other@example.com"))
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+    def test_duplicate_of_a_running_request_gets_409(self):
+        self.fill_cart(1)
+        IdempotencyKey.objects.create(
+            user=self.customer,
+            key="retry-1",
+            expires_at=timezone.now() + timedelta(hours=1),
+            locked_until=timezone.now() + timedelta(seconds=30),
+        )
+        with mock.patch.object(OrderCreateView, "idempotency_wait", 0):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def test_key_of_a_request_that_died_is_taken_over_once_its_lease_ends(self):
+        self.fill_cart(1)
+        IdempotencyKey.objects.create(
+            user=self.customer,
+            key="retry-1",
+            expires_at=timezone.now() + timedelta(hours=1),
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(self.checkout()["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_keys_run_again(self):
+        self.fill_cart(1)
+        self.checkout()
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self.fill_cart(1)
+        self.assertEqual(self.checkout().status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_conflicts_are_not_stored(self):
+        self.fill_cart(2)
+        with mock.patch.object(QuerySet, "delete", return_value=(1, {})):
+            self.assertEqual(self.checkout().status_code, 409)
+        self.assertEqual(self.checkout().status_code, 201)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class OrderHistoryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer@example.com")
+        Order.objects.create(
+            user=make_user("other@example.com"), status="PENDING", total_amount=5
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def place(self, count):
+        Order.objects.bulk_create(
+            Order(user=self.customer, status="COMPLETED", total_amount=i)
+            for i in range(count)
+        )
+
+    def test_history_pages_through_the_users_orders(self):
+        self.place(45)
+        ids, url = [], "/orders/api/?page_size=100"
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data["data"]), 20)
+            ids += [order["id"] for order in response.data["data"]]
+            url = response.data["next"]
+        expected = Order.objects.filter(user=self.customer).order_by(
+            "-order_date", "-id"
+        )
+        self.assertEqual(ids, list(expected.values_list("id", flat=True)))
+
+    def test_history_merges_archived_orders(self):
+        self.place(30)
+        now = timezone.now()
+        for days, order in enumerate(Order.objects.filter(user=self.customer)):
+            order.order_date = now - timedelta(days=days)
+            order.save(update_fields=["order_date"])
+        # An open order older than every archived one stays in the hot table.
+        stuck = Order.objects.create(
+            user=self.customer, status="PENDING", total_amount=1
+        )
+        Order.objects.filter(pk=stuck.pk).update(order_date=now - timedelta(days=90))
+        expected = list(
+            Order.objects.filter(user=self.customer)
+            .order_by("-order_date", "-id")
+            .values_list("id", flat=True)
+        )
+        archive_orders(now - timedelta(days=10), limit=100)
+        self.assertEqual(ArchivedOrder.objects.count(), 19)
+
+        ids, url = [], "/orders/api/"
+        while url:
+            response = self.client.get(url)
+            ids += [order["id"] for order in response.data["data"]]
+            url = response.data["next"]
+        self.assertEqual(ids, expected)
+
+    def test_query_count_does_not_grow_with_history(self):
+        for count in (1, 60):
+            self.place(count)
+            archive_orders(timezone.now() + timedelta(minutes=1), limit=100)
+            self.place(count)
+            # Each table's page and its items.
+            with self.assertNumQueries(4):
+                self.client.get("/orders/api/")
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class ArchiveOrdersTests(CheckoutTestCase):
+    def setUp(self):
+        super().setUp()
+        Menu.objects.update(quantity=100)
+
+    def place(self, status, days_ago):
+        self.fill_cart(2)
+        order = self.checkout().data["data"][0]
+        Order.objects.filter(pk=order["id"]).update(
+            status=status, order_date=timezone.now() - timedelta(days=days_ago)
+        )
+        return order["id"]
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command("archive_orders", stdout=out, **options)
+        return out.getvalue()
+
+    def test_moves_old_finished_orders_in_batches(self):
+        old = [self.place("COMPLETED", 40) for _ in range(3)]
+        old.append(self.place("CANCELLED", 40))
+        kept = [self.place("PENDING", 40), self.place("COMPLETED", 5)]
+
+        report = self.archive(older_than=30, batch_size=3, pause=0)
+        self.assertIn("archived 4 orders, 8 items in 2 batches", report)
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.values_list("id", flat=True)), sorted(old)
+        )
+        self.assertEqual(
+            sorted(Order.objects.values_list("id", flat=True)), sorted(kept)
+        )
+        self.assertEqual(OrderItem.objects.filter(order__in=old).count(), 0)
+        archived = ArchivedOrder.objects.get(pk=old[0])
+        self.assertEqual(
+            sorted(archived.order_items.values_list("menu_item", "quantity")),
+            [(self.menus[0].id, 2), (self.menus[1].id, 2)],
+        )
+
+    def test_interrupted_run_resumes_where_it_stopped(self):
+        orders = [self.place("COMPLETED", 40) for _ in range(3)]
+        with mock.patch(
+            "orders.archive.ArchivedOrderItem.objects.bulk_create",
+            side_effect=[None, RuntimeError("disk full")],
+        ):
+            with self.assertRaises(RuntimeError):
+                self.archive(older_than=30, batch_size=2, pause=0)
+        # The failed batch rolled back; the first one stayed archived.
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.assertIn("archived 1 orders", self.archive(older_than=30, pause=0))
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.values_list("id", flat=True)), orders
+        )
+
+    def test_archived_orders_can_still_be_read(self):
+        order_id = self.place("COMPLETED", 40)
+        self.archive(older_than=30)
+        url = f"/orders/api/{order_id}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["status"], "COMPLETED")
+        self.assertEqual(len(response.data["data"]["order_items"]), 2)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.client.force_authenticate(make_user("other@example.com"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class OrderExportTests(CheckoutTestCase):
+    def setUp(self):
+        super().setUp()
+        # Two orders from Buka, one archived; one from Mama Put.
+        self.fill_cart(2)
+        self.checkout()
+        Order.objects.update(status="COMPLETED")
+        archive_orders(timezone.now() + timedelta(minutes=1), limit=10)
+        self.fill_cart(4)
+        self.checkout()
+
+    def export(self, user, export_format="csv"):
+        token = AccessToken.for_user(user)
+        response = self.client.get(
+            f"/orders/api/export/?format={export_format}",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        return response
+
+    def test_csv_export_lists_every_item_including_archived_ones(self):
+        response = self.export(self.customer)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(StringIO(response.getvalue().decode())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(
+            sorted((row["menu_item"], row["quantity"]) for row in rows),
+            sorted((menu.name, "2") for menu in self.menus[:2] + self.menus[:4]),
+        )
+
+    def test_owner_exports_their_restaurants_orders_as_ndjson(self):
+        owner = make_user("second-owner@example.com", role="owner")
+        Restaurants.objects.filter(pk=self.restaurants[1].pk).update(owner=owner)
+        response = self.export(owner, "ndjson")
+        rows = [json.loads(line) for line in response.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["restaurant_id"], self.restaurants[1].id)
+        self.assertEqual(rows[0]["price"], "16.00")
+
+    def test_export_streams_in_one_query_per_table(self):
+        # The token's user, then one cursor each over the hot and archived items.
+        with (
+            mock.patch.object(
+                QuerySet, "iterator", autospec=True, side_effect=QuerySet.iterator
+            ) as iterator,
+            self.assertNumQueries(3),
+        ):
+            response = self.export(self.customer)
+            self.assertTrue(response.streaming)
+            response.getvalue()
+        self.assertEqual(iterator.call_count, 2)
+
+    def test_export_needs_a_token_and_a_known_format(self):
+        self.assertEqual(self.client.get("/orders/api/export/").status_code, 401)
+        self.assertEqual(self.export(self.customer, "xml").status_code, 400)
+
+
+class OrderExportAsgiTests(TransactionTestCase):
+    def setUp(self):
+        self.customer = make_user("customer@example.com")
+        restaurant = make_restaurant(make_user("owner@example.com", role="owner"))
+        menus = [make_menu(restaurant, f"Dish {i}") for i in range(3)]
+        for status in ("COMPLETED", "PENDING"):
+            order = Order.objects.create(
+                user=self.customer,
+                restaurant=restaurant,
+                status=status,
+                total_amount=20,
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, menu_item=menu, quantity=1, price=10)
+                for menu in menus
+            )
+        archive_orders(timezone.now() + timedelta(minutes=1), limit=10)
+
+    async def test_export_is_streamed_a_chunk_at_a_time(self):
+        token = await sync_to_async(AccessToken.for_user)(self.customer)
+        stream = Stream(
+            application, "/orders/api/export/?format=csv", str(token), "testserver"
+        )
+        with (
+            mock.patch("orders.export.EXPORT_CHUNK_SIZE", 2),
+            warnings.catch_warnings(record=True) as caught,
+        ):
+            warnings.simplefilter("always")
+            await asyncio.wait_for(stream.open(), 5)
+
+        self.assertEqual(stream.status_code, 200)
+        rows = list(csv.DictReader(StringIO(stream.body)))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(
+            sorted(row["status"] for row in rows), ["COMPLETED"] * 3 + ["PENDING"] * 3
+        )
+        # Django warns when it has to buffer a synchronous iterator.
+        self.assertEqual([str(w.message) for w in caught], [])
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class OrderStatusTransitionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer@example.com")
+        cls.staff = make_user("staff@example.com")
+        cls.staff.is_staff = True
+        cls.staff.save()
+        cls.order = Order.objects.create(
+            user=cls.customer, status="PENDING", total_amount=10
+        )
+        cls.url = f"/orders/api/{cls.order.id}/status/"
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def move(self, expected_status, new_status):
+        return self.client.post(
+            self.url,
+            {"expected_status": expected_status, "status": new_status},
+            format="json",
+        )
+
+    def test_customer_cancels_a_pending_order_with_one_update(self):
+        with (
+            mock.patch.object(broker, "publish") as publish,
+            self.captureOnCommitCallbacks(execute=True),
+            # The UPDATE and a read of the items to give back, in a savepoint.
+            self.assertNumQueries(4),
+        ):
+            response = self.move("PENDING", "CANCELLED")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["status"], "CANCELLED")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "CANCELLED")
+        publish.assert_called_once_with(
+            self.order.pk, {"id": self.order.pk, "status": "CANCELLED"}
+        )
+
+    def test_lost_race_returns_409_with_the_current_status(self):
+        Order.objects.filter(pk=self.order.pk).update(status="PROCESSING")
+        with self.assertNumQueries(4):
+            response = self.move("PENDING", "CANCELLED")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["data"]["status"], "PROCESSING")
+
+    def test_transitions_follow_the_table(self):
+        self.assertEqual(self.move("COMPLETED", "PENDING").status_code, 400)
+        self.assertEqual(self.move("PENDING", "PROCESSING").status_code, 403)
+        self.client.force_authenticate(self.staff)
+        for current, new in [("PENDING", "PROCESSING"), ("PROCESSING", "COMPLETED")]:
+            self.assertEqual(self.move(current, new).status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "COMPLETED")
+
+    def test_other_users_orders_are_not_found(self):
+        self.client.force_authenticate(make_user("other@example.com"))
+        self.assertEqual(self.move("PENDING", "CANCELLED").status_code, 404)
+
+    def test_processed_orders_cannot_be_edited_or_deleted(self):
+        Order.objects.filter(pk=self.order.pk).update(status="COMPLETED")
+        detail = f"/orders/api/{self.order.id}/"
+        self.assertEqual(self.client.patch(detail, {}).status_code, 400)
+        self.assertEqual(self.client.delete(detail).status_code, 400)
+        self.assertTrue(Order.objects.filter(pk=self.order.pk).exists())
+
+
+class OrderCancellationTests(CheckoutTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fill_cart(3)
+        self.order_id = self.checkout().data["data"][0]["id"]
+
+    def stock(self):
+        return list(
+            Menu.objects.filter(pk__in=[m.pk for m in self.menus[:3]])
+            .order_by("pk")
+            .values_list("quantity", flat=True)
+        )
+
+    def sales(self):
+        return list(DailySales.objects.values_list("orders", "quantity", "revenue"))
+
+    def cancel(self):
+        return self.client.post(
+            f"/orders/api/{self.order_id}/status/",
+            {"expected_status": "PENDING", "status": "CANCELLED"},
+            format="json",
+        )
+
+    def test_cancelling_gives_back_stock_and_sales(self):
+        self.assertEqual(self.stock(), [8, 8, 8])
+        # The UPDATE, a read of the items, one UPDATE ... CASE each of the
+        # stock and the rollups, in a savepoint.
+        with self.assertNumQueries(6):
+            self.assertEqual(self.cancel().status_code, 200)
+        self.assertEqual(self.stock(), [10, 10, 10])
+        self.assertEqual(self.sales(), [(0, 0, Decimal("0.00"))] * 3)
+
+    def test_deleting_gives_back_stock_and_sales(self):
+        response = self.client.delete(f"/orders/api/{self.order_id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Order.objects.filter(pk=self.order_id).exists())
+        self.assertEqual(self.stock(), [10, 10, 10])
+        self.assertEqual(self.sales(), [(0, 0, Decimal("0.00"))] * 3)
+
+    def test_deleting_a_cancelled_order_gives_nothing_back_twice(self):
+        self.cancel()
+        self.client.delete(f"/orders/api/{self.order_id}/")
+        self.assertEqual(self.stock(), [10, 10, 10])
+        self.assertEqual(self.sales(), [(0, 0, Decimal("0.00"))] * 3)
+
+    def test_rebuild_leaves_cancelled_orders_out(self):
+        self.cancel()
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertFalse(DailySales.objects.exists())
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class IncomingOrdersTests(CheckoutTestCase):
+    def setUp(self):
+        self.client.force_authenticate(self.restaurants[0].owner)
+        self.url = f"/orders/api/incoming/?restaurant={self.restaurants[0].id}"
+
+    def place(self, restaurant, count, status="PENDING"):
+        Order.objects.bulk_create(
+            Order(
+                user=self.customer,
+                restaurant=restaurant,
+                status=status,
+                total_amount=10,
+            )
+            for _ in range(count)
+        )
+
+    def test_queue_lists_the_restaurants_orders_oldest_first(self):
+        self.place(self.restaurants[0], 3)
+        self.place(self.restaurants[0], 2, status="PROCESSING")
+        self.place(self.restaurants[1], 2)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        expected = Order.objects.filter(
+            restaurant=self.restaurants[0], status="PENDING"
+        ).order_by("order_date", "id")
+        self.assertEqual(
+            [order["id"] for order in response.data["data"]],
+            list(expected.values_list("id", flat=True)),
+        )
+        processing = self.client.get(self.url + "&status=processing")
+        self.assertEqual(len(processing.data["data"]), 2)
+
+    def test_pages_through_the_queue_with_a_fixed_query_count(self):
+        self.place(self.restaurants[0], 120)
+        ids, url = [], self.url
+        while url:
+            # The page of orders, then their items.
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            ids += [order["id"] for order in response.data["data"]]
+            url = response.data["next"]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 120)
+
+    def test_only_the_restaurants_owner_sees_its_queue(self):
+        self.place(self.restaurants[0], 1)
+        self.client.force_authenticate(make_user("rival@example.com", role="owner"))
+        self.assertEqual(self.client.get(self.url).data["data"], [])
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_restaurant_is_required(self):
+        response = self.client.get("/orders/api/incoming/")
+        self.assertEqual(response.status_code, 400)
+
+    def test_owner_moves_an_order_through_the_kitchen(self):
+        self.fill_cart(1)
+        self.client.force_authenticate(self.customer)
+        order_id = self.checkout().data["data"][0]["id"]
+        self.client.force_authenticate(self.restaurants[0].owner)
+        for current, new in [("PENDING", "PROCESSING"), ("PROCESSING", "COMPLETED")]:
+            response = self.client.post(
+                f"/orders/api/{order_id}/status/",
+                {"expected_status": current, "status": new},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(pk=order_id).status, "COMPLETED")
+
+
+class OrderStatusEventsTests(TransactionTestCase):
+    def setUp(self):
+        self.customer = make_user("customer@example.com")
+        self.order = Order.objects.create(
+            user=self.customer, status="PENDING", total_amount=10
+        )
+        self.token = str(AccessToken.for_user(self.customer))
+
+    def stream(self, order_id=None, token=None):
+        order_id = order_id or self.order.pk
+        return Stream(
+            application,
+            f"/orders/api/{order_id}/events/",
+            token or self.token,
+            "testserver",
+        )
+
+    async def set_status(self, new_status):
+        self.order.status = new_status
+        await sync_to_async(self.order.save)(update_fields=["status", "updated_at"])
+
+    async def test_stream_follows_the_order_until_it_is_final(self):
+        stream = self.stream()
+        task = asyncio.create_task(stream.open())
+        await stream.received("PENDING")
+        for new_status in ("PROCESSING", "COMPLETED"):
+            await self.set_status(new_status)
+            await asyncio.wait_for(stream.received(new_status), 5)
+        await asyncio.wait_for(task, 5)
+
+        self.assertEqual(stream.status_code, 200)
+        self.assertEqual(stream.body.count("event: status"), 3)
+        self.assertEqual(broker.subscriber_count(self.order.pk), 0)
+
+    async def test_saves_without_a_status_change_are_not_sent(self):
+        stream = self.stream()
+        task = asyncio.create_task(stream.open())
+        await stream.received("PENDING")
+        self.order.total_amount = 12
+        await sync_to_async(self.order.save)(update_fields=["total_amount"])
+        await self.set_status("PENDING")
+        await self.set_status("CANCELLED")
+        await asyncio.wait_for(task, 5)
+        self.assertEqual(stream.body.count("event: status"), 2)
+
+    async def test_requires_the_owners_token(self):
+        other = await sync_to_async(make_user)("other@example.com")
+        cases = [
+            (self.stream(token="not-a-token"), 401),
+            (self.stream(token=str(AccessToken.for_user(other))), 404),
+            (self.stream(order_id=self.order.pk + 1), 404),
+        ]
+        for stream, expected in cases:
+            await asyncio.wait_for(stream.open(), 5)
+            self.assertEqual(stream.status_code, expected)
+        self.assertEqual(broker.subscriber_count(), 0)
@@ -0,0 +1,94 @@
+"""
+The order status state machine.
+
+``TRANSITIONS`` lists every status an order may move to from each status.
+A change is a compare-and-set: one ``UPDATE ... WHERE id = ? AND status = ?``
+that only succeeds while the order still has the status the caller saw.
+Two people moving the same order at once cannot both win, and neither
+reads or rewrites the rest of the row.
+"""
+
+from contextlib import nullcontext
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from .checkout import release_order
+from .models import Order
+from .signals import publish_status
+
+TRANSITIONS = {
+    "PENDING": {"PROCESSING", "CANCELLED"},
+    "PROCESSING": {"COMPLETED", "CANCELLED"},
+    "COMPLETED": set(),
+    "CANCELLED": set(),
+}
+
+# What a customer may do to their own order. Owners may make any change to
+# their restaurants' orders, staff to every order.
+CUSTOMER_TRANSITIONS = {("PENDING", "CANCELLED")}
+
+
+class InvalidTransition(Exception):
+    """Raised for a change ``TRANSITIONS`` does not allow."""
+
+
+class StatusConflict(Exception):
+    """
+    Raised when the order no longer has the expected status; ``current``
+    is the status it has now.
+    """
+
+    def __init__(self, current):
+        super().__init__(current)
+        self.current = current
+
+
+def changeable_orders(user, current, new):
+    """
+    The orders ``user`` may move from ``current`` to ``new``, or None when
+    there are none.
+    """
+    if user.is_staff:
+        return Order.objects.all()
+    scopes = []
+    if user.role == "owner":
+        scopes.append(Q(restaurant__owner=user))
+    if (current, new) in CUSTOMER_TRANSITIONS:
+        scopes.append(Q(user=user))
+    if not scopes:
+        return None
+    return Order.objects.filter(reduce(or_, scopes))
+
+
+def transition(queryset, order_id, current, new):
+    """
+    Move order ``order_id`` from ``current`` to ``new`` with one conditional
+    UPDATE. ``queryset`` limits which orders the caller may change.
+
+    Raises ``InvalidTransition`` if the table does not allow the change,
+    ``StatusConflict`` if the order has moved on from ``current``, and
+    ``Order.DoesNotExist`` if ``queryset`` has no such order. Only the
+    failure paths read anything, and then only the status column; a
+    cancellation also gives the order's stock and sales back, in the same
+    transaction.
+    """
+    if new not in TRANSITIONS.get(current, ()):
+        raise InvalidTransition(current, new)
+    cancelling = new == "CANCELLED"
+    with transaction.atomic() if cancelling else nullcontext():
+        updated = queryset.filter(pk=order_id, status=current).update(
+            status=new, updated_at=Now()
+        )
+        if updated and cancelling:
+            release_order(order_id)
+    if not updated:
+        status = queryset.filter(pk=order_id).values_list("status", flat=True).first()
+        if status is None:
+            raise Order.DoesNotExist
+        raise StatusConflict(status)
+    # update() sends no post_save, so tell the event streams here.
+    publish_status(order_id, new)
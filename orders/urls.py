@@ -1,8 +1,17 @@
 from django.urls import path
 
-from .views import OrderRetrieveUpdateDestroyAPIView, OrderCreateView
+from .export import export_orders
+from .views import (
+    IncomingOrdersView,
+    OrderCreateView,
+    OrderRetrieveUpdateDestroyAPIView,
+    OrderStatusView,
+)
 
 urlpatterns = [
     path("<int:pk>/", OrderRetrieveUpdateDestroyAPIView.as_view()),
+    path("<int:pk>/status/", OrderStatusView.as_view()),
+    path("incoming/", IncomingOrdersView.as_view()),
+    path("export/", export_orders),
     path("", OrderCreateView.as_view()),
 ]
@@ -1,23 +1,36 @@
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import (
+    GenericAPIView,
+    ListAPIView,
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
-    get_object_or_404,
 )
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from carts.models import Cart
 from carts.serializers import CartSerializer
-from orders.models import OrderItem, Order
-from orders.serializers import OrderSerializer
+from orders.checkout import CartChanged, EmptyCart, place_order, release_order
+from orders.idempotency import IdempotentCreateMixin
+from orders.models import ArchivedOrder, Order
+from orders.pagination import IncomingOrderPagination, OrderHistoryPagination
+from orders.serializers import OrderSerializer, OrderStatusSerializer
+from orders.transitions import StatusConflict, changeable_orders, transition
+from restaurants.mixins import CachedObjectMixin, ConditionalDetailMixin
 
 
 @extend_schema_view(
     post=extend_schema(
         summary="Create a new order",
-        description="Create a new order",
+        description="Create orders from the cart, one per restaurant it holds "
+        "dishes from. Send an Idempotency-Key header to make retries safe: a "
+        "repeated key returns the first response instead of placing the "
+        "orders again.",
         request=None,
         responses={200: {"description": "Successful Response"}},
         tags=["orders"],
@@ -29,46 +42,42 @@ from orders.serializers import OrderSerializer
         responses={200: {"description": "Successful Response"}},
     ),
 )
-class OrderCreateView(ListCreateAPIView):
+class OrderCreateView(IdempotentCreateMixin, ListCreateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderHistoryPagination
 
-    def get_object(self):
-        return Cart.objects.exists()
+    def get_queryset(self):
+        # Items are rendered with their menu item's id only, so prefetching
+        # the items alone is enough: two queries per page, however long the
+        # history.
+        return (
+            super()
+            .get_queryset()
+            .filter(user=self.request.user)
+            .prefetch_related("order_items")
+        )
 
     def create(self, request, *args, **kwargs):
-        instance = self.get_object()
-        if not instance:
+        try:
+            orders = place_order(request.user)
+        except EmptyCart:
             data = {
                 "msg": "You cannot create an order with empty cart.",
                 "status": False,
             }
             return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        except CartChanged:
+            data = {
+                "msg": "Your cart changed while the order was being placed, "
+                "please try again.",
+                "status": False,
+            }
+            return Response(data, status=status.HTTP_409_CONFLICT)
 
-        cart = Cart.objects.filter(user=request.user)
-        cart.calculate_total_price()
-
-        order = Order.objects.create(
-            user=request.user, cart=cart, total_amount=total_price
-        )
-
-        order_item_create_list = []
-
-        for item in cart.item.all():
-            order_item_create_list.append(
-                OrderItem.objects.create(
-                    order=item.order,
-                    menu_item=item.menu,
-                    quantity=item.quantity,
-                    price=item.cart_item_price(),
-                )
-            )
-
-        OrderItem.objects.bulk_create(order_item_create_list)
-
-        cart.delete()
-        serializer = self.serializer_class(order)
+        prefetch_related_objects(orders, "order_items")
+        serializer = self.serializer_class(orders, many=True)
 
         data = {
             "msg": "Order created successfully.",
@@ -78,27 +87,59 @@ class OrderCreateView(ListCreateAPIView):
 
         return Response(data, status=status.HTTP_201_CREATED)
 
+    def get_archive_queryset(self):
+        return ArchivedOrder.objects.filter(user=self.request.user).prefetch_related(
+            "order_items"
+        )
+
     def list(self, request, *args, **kwargs):
-        response = super().list(request, *args, **kwargs)
+        # Finished orders may have been archived; the history merges both.
+        page = self.paginator.paginate_querysets(
+            [self.get_queryset(), self.get_archive_queryset()], request
+        )
+        serializer = self.get_serializer(page, many=True)
         data = {
             "msg": "Order list created successfully.",
-            "data": response.data,
+            "data": serializer.data,
+            "next": self.paginator.get_next_link(),
             "status": True,
         }
         return Response(data, status=status.HTTP_200_OK)
 
 
-class OrderRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
+class OrderRetrieveUpdateDestroyAPIView(
+    CachedObjectMixin, ConditionalDetailMixin, RetrieveUpdateDestroyAPIView
+):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_object(self):
-        return get_object_or_404(Order, pk=self.kwargs["pk"], user=self.request.user)
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def get_validator_queryset(self):
+        return self.get_queryset().filter(pk=self.kwargs["pk"])
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except Http404:
+            # Archived orders can still be read, though no longer changed.
+            archived = get_object_or_404(
+                ArchivedOrder.objects.prefetch_related("order_items"),
+                pk=self.kwargs["pk"],
+                user=request.user,
+            )
+        data = {
+            "msg": "Order retrieved successfully.",
+            "data": self.get_serializer(archived).data,
+            "status": True,
+        }
+        return Response(data, status=status.HTTP_200_OK)
 
     def perform_update(self, serializer):
-        instance = self.get_object()
-        if instance.status in ["processing", "completed"]:
+        instance = serializer.instance
+        if instance.status in ["PROCESSING", "COMPLETED"]:
             return Response(
                 {
                     "msg": "Order already processed.",
@@ -110,8 +151,7 @@ class OrderRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         return None
 
     def perform_destroy(self, instance):
-        instance = self.get_object()
-        if instance.status == "completed":
+        if instance.status == "COMPLETED":
             return Response(
                 {
                     "msg": "Order is already completed.",
@@ -119,14 +159,35 @@ class OrderRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        instance.delete()
+        # Deleting a live order gives its stock and sales back. The DELETE
+        # only matches while the order still has the status read above, so
+        # a concurrent cancellation cannot give them back a second time.
+        with transaction.atomic():
+            if instance.status != "CANCELLED":
+                release_order(instance.pk)
+            deleted, _ = Order.objects.filter(
+                pk=instance.pk, status=instance.status
+            ).delete()
+            if not deleted:
+                transaction.set_rollback(True)
+        if not deleted:
+            return Response(
+                {
+                    "msg": "The order's status changed, "
+                    "fetch it again before deleting.",
+                    "status": False,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
         return None
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        refused = self.perform_update(serializer)
+        if refused is not None:
+            return refused
         data = {
             "msg": "Order updated successfully.",
             "data": serializer.data,
@@ -144,9 +205,133 @@ class OrderRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         return Response(data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
-        self.perform_destroy(self.get_object())
+        refused = self.perform_destroy(self.get_object())
+        if refused is not None:
+            return refused
         data = {
             "msg": "Order deleted successfully.",
             "status": True,
         }
         return Response(data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=OrderStatusSerializer,
+    responses={200: {"description": "Successful Response"}},
+    tags=["orders"],
+)
+class OrderStatusView(GenericAPIView):
+    """
+    Move an order along its status state machine.
+
+    POST:
+        Takes ``{"expected_status": ..., "status": ...}`` and applies it with
+        one conditional UPDATE. Answers 409 with the order's current status
+        if it no longer has ``expected_status``. Customers may cancel their
+        own pending orders; owners may make any allowed change to their
+        restaurants' orders, staff to any order.
+    """
+
+    serializer_class = OrderStatusSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        current = serializer.validated_data["expected_status"]
+        new = serializer.validated_data["status"]
+        orders = changeable_orders(request.user, current, new)
+        if orders is None:
+            return Response(
+                {
+                    "msg": f"You cannot move an order from {current} to {new}.",
+                    "status": False,
+                },
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            transition(orders, self.kwargs["pk"], current, new)
+        except Order.DoesNotExist:
+            return Response(
+                {"msg": "Order not found.", "status": False},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except StatusConflict as conflict:
+            return Response(
+                {
+                    "msg": "The order's status changed, "
+                    "fetch it again before updating.",
+                    "data": {"id": self.kwargs["pk"], "status": conflict.current},
+                    "status": False,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            {
+                "msg": "Order status updated successfully.",
+                "data": {"id": self.kwargs["pk"], "status": new},
+                "status": True,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter("restaurant", int, required=True),
+        OpenApiParameter("status", str, enum=[c for c, _ in Order.ORDERCHOICES]),
+    ],
+    tags=["orders"],
+)
+class IncomingOrdersView(ListAPIView):
+    """
+    A restaurant's order queue, for its owner.
+
+    GET:
+        Orders for ``?restaurant=`` in ``?status=`` (PENDING by default),
+        oldest first, 50 per page with a ``next`` cursor. A page is one
+        range scan of the (restaurant, status, order_date) index plus one
+        query for the items.
+    """
+
+    queryset = Order.objects.all()
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = IncomingOrderPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        try:
+            restaurant = int(params["restaurant"])
+        except (KeyError, ValueError):
+            raise ValidationError({"restaurant": "Pass the restaurant's id."})
+        order_status = params.get("status", "PENDING").upper()
+        if order_status not in dict(Order.ORDERCHOICES):
+            raise ValidationError({"status": f"Unknown status {order_status}."})
+        return (
+            super()
+            .get_queryset()
+            .filter(
+                restaurant_id=restaurant,
+                restaurant__owner=self.request.user,
+                status=order_status,
+            )
+            .prefetch_related("order_items")
+        )
+
+    def list(self, request, *args, **kwargs):
+        if request.user.role != "owner":
+            return Response(
+                {"msg": "Only owners can see incoming orders", "status": False},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        data = {
+            "msg": "Incoming orders retrieved successfully.",
+            "data": serializer.data,
+            "next": self.paginator.get_next_link(),
+            "status": True,
+        }
+        return Response(data, status=status.HTTP_200_OK)
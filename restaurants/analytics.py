@@ -0,0 +1,155 @@
+"""
+Per-restaurant sales rollups.
+
+``DailySales`` keeps one row per (restaurant, menu item, day). Checkout
+adds each order's lines to it with ``record_sales()`` in the order's own
+transaction, cancelling takes them out again with ``remove_sales()``, and
+``rebuild_sales_rollups`` recomputes it from the order history. The owner
+dashboard reads only these rows, so its cost depends on the size of the
+menu and the date range, not on the number of orders.
+"""
+
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .bulk import batched
+from .models import DailySales
+
+# Seven parameters per row keeps a batch well under SQLite's parameter limit.
+SALES_BATCH_SIZE = 100
+
+
+def record_sales(rows, table=DailySales._meta.db_table):
+    """
+    Add ``(restaurant_id, menu_item_id, day, orders, quantity, revenue)``
+    rows to the rollups with ``INSERT ... ON CONFLICT DO UPDATE``, which
+    SQLite and PostgreSQL both support. The increment happens in the
+    database, so concurrent checkouts never lose each other's sales.
+    ``table`` may name another table with the same columns and unique key,
+    such as the staging table of ``rebuild_sales_rollups``.
+    """
+    ops = connection.ops
+    table = ops.quote_name(table)
+    now = ops.adapt_datetimefield_value(timezone.now())
+    for batch in batched(rows, SALES_BATCH_SIZE):
+        params = []
+        for restaurant_id, menu_item_id, day, orders, quantity, revenue in batch:
+            params += [
+                restaurant_id,
+                menu_item_id,
+                ops.adapt_datefield_value(day),
+                orders,
+                quantity,
+                ops.adapt_decimalfield_value(revenue, 12, 2),
+                now,
+            ]
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(batch))
+        sql = (
+            f"INSERT INTO {table} "
+            "(restaurant_id, menu_item_id, day, orders, quantity, revenue, "
+            "updated_at) "
+            f"VALUES {values} "
+            "ON CONFLICT (restaurant_id, menu_item_id, day) DO UPDATE SET "
+            f"orders = {table}.orders + excluded.orders, "
+            f"quantity = {table}.quantity + excluded.quantity, "
+            f"revenue = {table}.revenue + excluded.revenue, "
+            "updated_at = excluded.updated_at"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def remove_sales(rows):
+    """
+    Take ``record_sales()`` rows back out of the rollups, e.g. for a
+    cancelled order, with one ``UPDATE ... CASE``. Counts stop at zero, for
+    orders placed before the rollups were built.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    amounts = {}
+    for index, field in enumerate(["orders", "quantity", "revenue"], start=3):
+        output_field = DailySales._meta.get_field(field)
+        amounts[field] = Greatest(
+            F(field)
+            - Case(
+                *(
+                    When(menu_item_id=row[1], day=row[2], then=Value(row[index]))
+                    for row in rows
+                ),
+                default=Value(0),
+                output_field=output_field,
+            ),
+            Value(0),
+            output_field=output_field,
+        )
+    DailySales.objects.filter(
+        menu_item_id__in={row[1] for row in rows}, day__in={row[2] for row in rows}
+    ).update(**amounts, updated_at=timezone.now())
+
+
+def order_item_sales(order_items):
+    """
+    Group an ``OrderItem`` or ``ArchivedOrderItem`` queryset into
+    ``record_sales()`` rows. Cancelled orders are left out, as cancelling
+    takes an order back out of the rollups.
+    """
+    return (
+        order_items.exclude(order__status="CANCELLED")
+        .annotate(day=TruncDate("order__order_date"))
+        .values_list("menu_item__restaurant_id", "menu_item_id", "day")
+        .annotate(orders=Count("id"), units=Sum("quantity"), total=Sum("price"))
+        .order_by()
+    )
+
+
+def combined_sales(*order_items):
+    """
+    Group several order item querysets, such as the live and the archived
+    ones, into ``record_sales()`` rows. They are read with one ``UNION ALL``
+    query, so an order archived meanwhile is seen in exactly one of them.
+    """
+    first, *rest = (order_item_sales(items) for items in order_items)
+    totals = {}
+    for restaurant_id, menu_item_id, day, orders, quantity, revenue in first.union(
+        *rest, all=True
+    ):
+        row = totals.setdefault((restaurant_id, menu_item_id, day), [0, 0, 0])
+        row[0] += orders
+        row[1] += quantity
+        row[2] += revenue
+    return [(*key, *row) for key, row in totals.items()]
+
+
+def sales_summary(restaurant, days):
+    """Totals, a per-day series and the top sellers over the last ``days``."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = DailySales.objects.filter(restaurant=restaurant, day__gte=since)
+    totals = rows.aggregate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+    by_day = (
+        rows.values("day")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .order_by("day")
+    )
+    top_sellers = (
+        rows.values("menu_item")
+        .annotate(
+            name=F("menu_item__name"),
+            orders=Sum("orders"),
+            quantity=Sum("quantity"),
+            revenue=Sum("revenue"),
+        )
+        .order_by("-quantity", "menu_item")[:10]
+    )
+    return {
+        "since": since,
+        "quantity": totals["quantity"] or 0,
+        "revenue": totals["revenue"] or 0,
+        "by_day": list(by_day),
+        "top_sellers": list(top_sellers),
+    }
@@ -0,0 +1,92 @@
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .cache import bump_menu_version
+from .models import Menu
+
+MENU_BATCH_SIZE = 500
+
+MENU_UPSERT_FIELDS = ["description", "price", "is_available", "quantity"]
+
+MENU_BULK_UPDATE_FIELDS = ["price", "is_available", "quantity"]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def write_menu_items(restaurant, items, batch_size=MENU_BATCH_SIZE):
+    """
+    Insert or update menu items for ``restaurant`` in batches of
+    ``batch_size``, keyed on the item name. An existing item only has the
+    fields present in its row overwritten. ``bulk_create`` sends no signals,
+    so the search index is written per batch and the menu cache version is
+    bumped once at the end instead.
+    Returns ``(created, updated)``.
+    """
+    created = updated = 0
+    for batch in batched(items, batch_size):
+        # A name repeated inside one batch would make the upsert touch the
+        # same row twice, which PostgreSQL rejects; the last one wins.
+        by_name = {item["name"]: item for item in batch}
+        existing = set(
+            Menu.objects.filter(restaurant=restaurant, name__in=by_name).values_list(
+                "name", flat=True
+            )
+        )
+        by_fields = {}
+        for item in by_name.values():
+            fields = [field for field in MENU_UPSERT_FIELDS if field in item]
+            by_fields.setdefault(tuple(fields), []).append(item)
+        for fields, group in by_fields.items():
+            # The upsert returns primary keys for both inserted and updated
+            # rows, which is what the search index is keyed on.
+            written = Menu.objects.bulk_create(
+                [Menu(restaurant=restaurant, **item) for item in group],
+                update_conflicts=True,
+                unique_fields=["restaurant", "name"],
+                update_fields=[*fields, "updated_at"],
+            )
+            search.index_menu_items(written)
+        updated += len(existing)
+        created += len(by_name) - len(existing)
+    if created or updated:
+        bump_menu_version(restaurant.pk)
+    return created, updated
+
+
+def update_menu_items(restaurant, changes):
+    """
+    Apply ``changes`` (validated dicts with an ``id`` plus the fields to
+    change) to ``restaurant``'s menu in one transaction: one locking read and
+    one batched UPDATE. Returns ``(items, missing_ids)``; nothing is written
+    if any id does not belong to the restaurant.
+    """
+    ids = [change["id"] for change in changes]
+    with transaction.atomic():
+        items = (
+            Menu.objects.select_for_update().filter(restaurant=restaurant).in_bulk(ids)
+        )
+        missing = sorted(set(ids) - set(items))
+        if missing:
+            return [], missing
+
+        now = timezone.now()
+        fields = {"updated_at"}
+        for change in changes:
+            item = items[change["id"]]
+            for field in MENU_BULK_UPDATE_FIELDS:
+                if field in change:
+                    setattr(item, field, change[field])
+                    fields.add(field)
+            item.updated_at = now
+        Menu.objects.bulk_update(items.values(), sorted(fields))
+        # bulk_update sends no signals; bump the cache once, after commit, so
+        # no reader can cache the old rows under the new version.
+        transaction.on_commit(lambda: bump_menu_version(restaurant.pk))
+    return [items[pk] for pk in dict.fromkeys(ids)], []
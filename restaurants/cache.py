@@ -0,0 +1,41 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+MENU_CACHE_TIMEOUT = 60 * 60
+
+
+def menu_version_key(restaurant_id):
+    return f"restaurants:menu-version:{restaurant_id}"
+
+
+def get_menu_version(restaurant_id):
+    """
+    Current version of a restaurant's menu. A missing counter is seeded from
+    the clock so an evicted counter never reuses a version of stale payloads.
+    """
+    key = menu_version_key(restaurant_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_menu_version(restaurant_id):
+    key = menu_version_key(restaurant_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def menu_etag(restaurant_id, version):
+    return quote_etag(f"menu-{restaurant_id}-{version}")
+
+
+def menu_payload_key(restaurant_id, version, url):
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f"restaurants:menu:{restaurant_id}:{version}:{digest}"
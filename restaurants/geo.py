@@ -0,0 +1,81 @@
+"""
+Geohash helpers for "restaurants near me".
+
+Restaurants store a geohash of their coordinates in an indexed column. A
+proximity query covers the search circle with the 3x3 block of geohash cells
+around the centre, turns each cell into an index range scan, and finishes
+with an exact haversine distance on the few candidates that come back.
+"""
+
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+STORED_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def encode(latitude, longitude, precision=STORED_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """Height and width of a geohash cell in degrees."""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def covering_precision(latitude, radius_km):
+    """Finest precision whose cells are at least ``radius_km`` on each side."""
+    # Cells narrow towards the poles, so size them for the poleward edge.
+    edge = min(abs(latitude) + radius_km / KM_PER_DEGREE, 90.0)
+    shrink = max(math.cos(math.radians(edge)), 1e-6)
+    for precision in range(STORED_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if (
+            height * KM_PER_DEGREE >= radius_km
+            and width * KM_PER_DEGREE * shrink >= radius_km
+        ):
+            return precision
+    return 1
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Geohash prefixes of the 3x3 cell block around a point."""
+    precision = covering_precision(latitude, radius_km)
+    height, width = cell_size(precision)
+    cells = set()
+    for dlat in (-height, 0, height):
+        for dlon in (-width, 0, width):
+            lat = min(max(latitude + dlat, -90.0), 90.0)
+            lon = (longitude + dlon + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
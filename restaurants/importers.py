@@ -0,0 +1,114 @@
+import csv
+import json
+
+from .bulk import MENU_BATCH_SIZE, batched, write_menu_items
+from .serializers import MenuImportSerializer
+
+# Only the first errors are described in the report, so a file full of bad
+# rows cannot grow it without bound; ``error_count`` still counts them all.
+MAX_REPORTED_ERRORS = 100
+
+
+class InvalidRow:
+    """Stands for a line a reader could not parse; ``error`` says why."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+NOT_UTF8 = "Line is not valid UTF-8."
+
+
+def decode_lines(upload, undecodable):
+    """
+    Decode an upload's byte lines one at a time. Lines that are not UTF-8
+    are added to ``undecodable`` by number and yielded with the bad bytes
+    replaced, so one of them cannot end the whole import.
+    """
+    for line, raw in enumerate(upload, start=1):
+        try:
+            yield raw.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            undecodable.add(line)
+            yield raw.decode("utf-8-sig", errors="replace")
+
+
+def read_csv_rows(upload):
+    """
+    Yield ``(line, row)`` pairs from a CSV upload with a header line. A row
+    that is not UTF-8 or not valid CSV comes as an ``InvalidRow``.
+    """
+    undecodable = set()
+    reader = csv.DictReader(decode_lines(upload, undecodable))
+    previous = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield reader.line_num, InvalidRow(f"Invalid CSV: {error}.")
+        else:
+            if 1 in undecodable:
+                # Without a readable header no row can be read.
+                yield 1, InvalidRow(NOT_UTF8)
+                return
+            if undecodable.intersection(range(previous + 1, reader.line_num + 1)):
+                yield reader.line_num, InvalidRow(NOT_UTF8)
+            else:
+                yield reader.line_num, {
+                    key: value
+                    for key, value in row.items()
+                    if key and value is not None
+                }
+        previous = reader.line_num
+
+
+def read_ndjson_rows(upload):
+    """Yield ``(line, row)`` pairs from an upload with one JSON object per line."""
+    undecodable = set()
+    for line, raw in enumerate(decode_lines(upload, undecodable), start=1):
+        if line in undecodable:
+            yield line, InvalidRow(NOT_UTF8)
+            continue
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            row = None
+        yield line, row
+
+
+def import_menu(restaurant, rows, batch_size=MENU_BATCH_SIZE):
+    """
+    Validate ``(line, row)`` pairs chunk by chunk and upsert the valid rows,
+    so memory stays bounded by ``batch_size`` however long the file is.
+    Returns a report with the created/updated counts, the number of rejected
+    lines and the errors for the first ``MAX_REPORTED_ERRORS`` of them.
+    """
+    report = {"created": 0, "updated": 0, "error_count": 0, "errors": []}
+
+    def reject(line, errors):
+        report["error_count"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line, "errors": errors})
+
+    for batch in batched(rows, batch_size):
+        valid = []
+        for line, row in batch:
+            if isinstance(row, InvalidRow):
+                reject(line, {"non_field_errors": [row.error]})
+                continue
+            if not isinstance(row, dict):
+                reject(line, {"non_field_errors": ["Invalid row."]})
+                continue
+            serializer = MenuImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append(serializer.validated_data)
+            else:
+                reject(line, serializer.errors)
+        created, updated = write_menu_items(restaurant, valid, batch_size)
+        report["created"] += created
+        report["updated"] += updated
+    return report
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from restaurants.bulk import batched
+from restaurants.models import Restaurants
+from restaurants.pagination import KeysetCursorPagination
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed throwaway restaurants, then time the restaurant list's first "
+        "page against a page --restaurants/20 deep, through the keyset query "
+        "of the cursors and through the OFFSET query they replaced. "
+        "Everything is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurants", type=int, default=100_000)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *args, **options):
+        count, page_size = options["restaurants"], options["page_size"]
+        deep_page = count // 20
+        if deep_page < 2 or deep_page * page_size > count:
+            raise CommandError(
+                "--restaurants must hold at least 20 pages of --page-size and "
+                "twice 20 rows."
+            )
+
+        with transaction.atomic():
+            self.seed(count)
+            # Both are timed as the bare page query, without the view around
+            # it. The row just before the deep page is the page's cursor.
+            paginator = KeysetCursorPagination()
+            ordered = Restaurants.objects.order_by("-created_at", "-id")
+            offset = (deep_page - 1) * page_size
+            cursor = paginator.get_key(ordered[offset - 1])
+
+            self.stdout.write(
+                f"{count} restaurants, {page_size} per page, page {deep_page} "
+                f"is {offset} rows deep"
+            )
+            for label, page in [
+                ("keyset page 1", paginator.seek(ordered, None)[:page_size]),
+                (
+                    f"keyset page {deep_page}",
+                    paginator.seek(ordered, cursor)[:page_size],
+                ),
+                ("offset page 1", ordered[:page_size]),
+                (f"offset page {deep_page}", ordered[offset : offset + page_size]),
+            ]:
+                self.report(label, self.time_page(page, page_size, options["runs"]))
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        owner = User.objects.create_user(
+            email="benchmark-pages-owner@example.com",
+            first_name="Benchmark",
+            last_name="Owner",
+            role="owner",
+        )
+        rows = (
+            Restaurants(
+                name=f"Restaurant {i}",
+                owner=owner,
+                description="",
+                address="",
+                phone_number="",
+            )
+            for i in range(count)
+        )
+        for batch in batched(rows, 5000):
+            Restaurants.objects.bulk_create(batch)
+
+    def time_page(self, page, page_size, runs):
+        timings, queries = [], set()
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                rows = list(page.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            assert len(rows) == page_size
+            queries.add(len(captured))
+        return sorted(timings), queries
+
+    def report(self, label, result):
+        timings, queries = result
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        counts = "/".join(map(str, sorted(queries)))
+        self.stdout.write(
+            f"{label:>18}: p50 {p50:.2f} ms, p95 {p95:.2f} ms, {counts} queries"
+        )
@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from restaurants import search
+from restaurants.bulk import batched
+from restaurants.models import Menu, Restaurants
+from users.models import User
+
+SYLLABLES = ["ba", "ke", "jo", "lo", "fu", "wa", "ye", "ki", "so", "ga", "mi", "tu"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed throwaway menu items, then time FTS5 search against icontains "
+        "scans. Everything is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            raise CommandError("Full-text search needs the SQLite backend.")
+
+        rng = random.Random(0)
+        words = sorted({"".join(rng.choices(SYLLABLES, k=4)) for _ in range(5000)})
+        with transaction.atomic():
+            self.seed(rng, words, options["items"])
+            terms = rng.sample(words, options["queries"])
+            limit = options["limit"]
+            fts = self.time_queries(terms, lambda t: search.search_menu(t, limit))
+            scan = self.time_queries(terms, lambda t: self.icontains(t, limit))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{options['items']} menu items, {len(terms)} queries")
+        self.report("fts5", fts)
+        self.report("icontains", scan)
+
+    def seed(self, rng, words, count):
+        owner = User.objects.create_user(
+            email="benchmark-search@example.com",
+            first_name="Benchmark",
+            last_name="Owner",
+            role="owner",
+        )
+        restaurant = Restaurants.objects.create(
+            name="Benchmark", owner=owner, description="", address="", phone_number=""
+        )
+        rows = (
+            Menu(
+                name=f"{rng.choice(words)} {rng.choice(words)} {i}",
+                description=" ".join(rng.choices(words, k=8)),
+                price=10,
+                restaurant=restaurant,
+            )
+            for i in range(count)
+        )
+        for batch in batched(rows, 5000):
+            Menu.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            search.rebuild(cursor)
+
+    def icontains(self, term, limit):
+        matches = Menu.objects.filter(
+            Q(name__icontains=term) | Q(description__icontains=term),
+            is_available=True,
+        )
+        return list(matches.order_by("name")[:limit])
+
+    def time_queries(self, terms, run):
+        timings = []
+        for term in terms:
+            start = time.perf_counter()
+            run(term)
+            timings.append((time.perf_counter() - start) * 1000)
+        return sorted(timings)
+
+    def report(self, label, timings):
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f"{label:>10}: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
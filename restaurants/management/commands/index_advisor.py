@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.generics import GenericAPIView
+from rest_framework.mixins import (
+    DestroyModelMixin,
+    ListModelMixin,
+    RetrieveModelMixin,
+    UpdateModelMixin,
+)
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from users.models import User
+
+# Query parameters some list views need before they can build their query,
+# such as the restaurant whose incoming orders are listed.
+SAMPLE_QUERY_PARAMS = {"restaurant": 1}
+
+
+def iter_api_views(patterns, prefix=""):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from iter_api_views(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, "view_class", None)
+            if view_class is not None and issubclass(view_class, GenericAPIView):
+                kwargs = {name: 1 for name in pattern.pattern.converters}
+                yield route, view_class, kwargs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every API view's get_queryset() shape, for owners and customers, "
+        "through EXPLAIN QUERY PLAN and report full table scans and temporary "
+        "B-trees. List views are planned as one ordered page, detail views as "
+        "a primary key lookup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail",
+            action="store_true",
+            help="Exit with an error if any query shape needs attention.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The index advisor reads SQLite query plans.")
+
+        factory = APIRequestFactory()
+        problems = 0
+        for route, view_class, kwargs in iter_api_views(get_resolver().url_patterns):
+            for role in ("owner", "customer"):
+                queryset = self.get_queryset(factory, view_class, kwargs, role)
+                if queryset is None:
+                    continue
+                issues = self.explain(queryset)
+                label = f"{view_class.__name__} [{role}] /{route}"
+                if issues:
+                    problems += len(issues)
+                    self.stdout.write(self.style.WARNING(label))
+                    for issue in issues:
+                        self.stdout.write(f"    {issue}")
+                else:
+                    self.stdout.write(f"{label}: ok")
+
+        if problems and options["fail"]:
+            raise CommandError(f"{problems} query plan issue(s) found.")
+
+    def get_queryset(self, factory, view_class, kwargs, role):
+        """The query the view would run for one page or one object."""
+        is_list = issubclass(view_class, ListModelMixin)
+        is_detail = kwargs and issubclass(
+            view_class, (RetrieveModelMixin, UpdateModelMixin, DestroyModelMixin)
+        )
+        if not (is_list or is_detail):
+            return None
+
+        view = view_class()
+        view.request = Request(factory.get("/", SAMPLE_QUERY_PARAMS))
+        view.request.user = User(pk=1, role=role)
+        view.args, view.kwargs, view.format_kwarg = (), kwargs, None
+        try:
+            queryset = view.get_queryset()
+        except AssertionError:
+            # Views without a queryset (search, imports) have nothing to plan.
+            return None
+
+        if not is_list:
+            return queryset.filter(pk=1)
+        paginator = view.pagination_class() if view.pagination_class else None
+        timestamp_field = getattr(paginator, "timestamp_field", None)
+        if timestamp_field:
+            direction = "-" if paginator.descending else ""
+            queryset = queryset.order_by(
+                f"{direction}{timestamp_field}", f"{direction}id"
+            )
+        page_size = getattr(paginator, "page_size", None)
+        return queryset[:page_size] if page_size else queryset
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        issues = []
+        for detail in plan:
+            # "SCAN t USING INDEX" walks an index in order and stops at the
+            # page limit; a bare "SCAN t" reads the whole table.
+            if detail.startswith("SCAN") and "USING" not in detail:
+                issues.append(f"full scan: {detail}")
+            elif "TEMP B-TREE" in detail:
+                issues.append(f"temp b-tree: {detail}")
+        return issues
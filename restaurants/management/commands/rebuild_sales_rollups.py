@@ -0,0 +1,194 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from restaurants.analytics import combined_sales, record_sales
+from restaurants.bulk import batched
+from restaurants.models import DailySales
+
+STAGING_TABLE = "restaurants_dailysales_rebuild"
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily sales rollups from the order history, live and "
+        "archived. Orders up to the newest one at the start are aggregated, "
+        "a chunk at a time, into a staging table, which then replaces the "
+        "rebuilt days in one transaction together with the orders placed, "
+        "cancelled or deleted meanwhile. Dashboards keep showing the old "
+        "numbers until then."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Only rebuild days from this date (YYYY-MM-DD) onwards.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Orders aggregated per query.",
+        )
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        archived = ArchivedOrder.objects.all()
+        rollups = DailySales.objects.all()
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be a date like 2025-01-31.")
+            start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+            orders = orders.filter(order_date__gte=start)
+            archived = archived.filter(order_date__gte=start)
+            rollups = rollups.filter(day__gte=since)
+
+        started = time.perf_counter()
+        # Checkout keeps adding to the live rollups while this runs. Orders
+        # after max_id are left to the swap, which adds them under a lock.
+        # Archiving keeps order ids, so one id range covers both tables.
+        # Orders up to max_id cancelled or deleted after their chunk was
+        # staged are found through what they touched since rebuild_start.
+        rebuild_start = timezone.now()
+        max_id = max(
+            Order.objects.aggregate(max_id=Max("pk"))["max_id"] or 0,
+            ArchivedOrder.objects.aggregate(max_id=Max("pk"))["max_id"] or 0,
+        )
+        create_staging_table()
+        try:
+            last_id, chunks, order_count = 0, 0, 0
+            while True:
+                chunk = {"pk__gt": last_id, "pk__lte": max_id}
+                ids = list(
+                    orders.filter(**chunk)
+                    .values_list("pk", flat=True)
+                    .order_by()
+                    .union(
+                        archived.filter(**chunk).values_list("pk", flat=True).order_by()
+                    )
+                    .order_by("pk")[: options["chunk_size"]]
+                )
+                if not ids:
+                    break
+                chunk = {"order_id__gt": last_id, "order_id__lte": ids[-1]}
+                rows = combined_sales(
+                    OrderItem.objects.filter(order__in=orders, **chunk),
+                    ArchivedOrderItem.objects.filter(order__in=archived, **chunk),
+                )
+                record_sales(rows, table=STAGING_TABLE)
+                last_id = ids[-1]
+                chunks += 1
+                order_count += len(ids)
+
+            with transaction.atomic():
+                lock_rollups()
+                changed = changed_keys(rollups, orders, archived, rebuild_start)
+                discard_staged(changed)
+                rollups.delete()
+                copy_staging_table()
+                # The orders placed meanwhile, plus every order of the keys
+                # that changed, whose staged numbers may be stale.
+                meanwhile = Q(order_id__gt=max_id)
+                for menu_item_id, day in changed:
+                    meanwhile |= Q(
+                        menu_item_id=menu_item_id, order__order_date__date=day
+                    )
+                record_sales(
+                    combined_sales(
+                        OrderItem.objects.filter(meanwhile, order__in=orders),
+                        ArchivedOrderItem.objects.filter(meanwhile, order__in=archived),
+                    )
+                )
+        finally:
+            drop_staging_table()
+
+        self.stdout.write(
+            f"rebuilt sales rollups from {order_count} orders in {chunks} chunks "
+            f"in {time.perf_counter() - started:.2f} s"
+        )
+
+
+def create_staging_table():
+    table = connection.ops.quote_name(STAGING_TABLE)
+    updated_at = DailySales._meta.get_field("updated_at").db_type(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {table} ("
+            "restaurant_id bigint NOT NULL, "
+            "menu_item_id bigint NOT NULL, "
+            "day date NOT NULL, "
+            "orders integer NOT NULL, "
+            "quantity integer NOT NULL, "
+            "revenue numeric(12, 2) NOT NULL, "
+            f"updated_at {updated_at} NOT NULL, "
+            "UNIQUE (restaurant_id, menu_item_id, day))"
+        )
+
+
+def changed_keys(rollups, orders, archived, since):
+    """
+    ``(menu_item_id, day)`` keys whose sales changed after ``since``: the
+    rollups checkout, cancelling or deleting touched, and the lines of the
+    orders updated, e.g. cancelled, since.
+    """
+    keys = set(rollups.filter(updated_at__gte=since).values_list("menu_item", "day"))
+    for items, orders in [
+        (OrderItem.objects, orders),
+        (ArchivedOrderItem.objects, archived),
+    ]:
+        keys.update(
+            items.filter(order__in=orders.filter(updated_at__gte=since))
+            .values_list("menu_item", TruncDate("order__order_date"))
+            .distinct()
+        )
+    return keys
+
+
+def discard_staged(keys):
+    staging = connection.ops.quote_name(STAGING_TABLE)
+    # Two parameters per key keeps a batch under SQLite's parameter limit.
+    for batch in batched(keys, 400):
+        condition = " OR ".join(["(menu_item_id = %s AND day = %s)"] * len(batch))
+        params = []
+        for menu_item_id, day in batch:
+            params += [menu_item_id, connection.ops.adapt_datefield_value(day)]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {staging} WHERE {condition}", params)
+
+
+def lock_rollups():
+    """
+    Stop checkouts from adding to the rollups until the transaction ends,
+    so none of them is counted twice or lost by the swap. SQLite already
+    allows one writer at a time; the swap's DELETE takes that lock.
+    """
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(DailySales._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+
+
+def copy_staging_table():
+    columns = "restaurant_id, menu_item_id, day, orders, quantity, revenue, updated_at"
+    table = connection.ops.quote_name(DailySales._meta.db_table)
+    staging = connection.ops.quote_name(STAGING_TABLE)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging}"
+        )
+
+
+def drop_staging_table():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DROP TABLE IF EXISTS {connection.ops.quote_name(STAGING_TABLE)}"
+        )
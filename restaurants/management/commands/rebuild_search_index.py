@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from restaurants import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for restaurants and menu items."
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            raise CommandError("Full-text search needs the SQLite backend.")
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.create_tables(cursor)
+            search.rebuild(cursor)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
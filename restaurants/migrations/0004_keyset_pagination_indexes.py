@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 14:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0003_menu_quantity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menu',
+            index=models.Index(fields=['restaurant', 'created_at', 'id'], name='restaurants_restaur_d19275_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurants',
+            index=models.Index(fields=['created_at', 'id'], name='restaurants_created_ec0c54_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 14:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_menu_names(apps, schema_editor):
+    """
+    Give repeated names within a restaurant a " (2)", " (3)", ... suffix so
+    the unique constraint can be added. The oldest item keeps its name;
+    items are renamed rather than merged because order lines point at them.
+    """
+    Menu = apps.get_model("restaurants", "Menu")
+    duplicates = (
+        Menu.objects.values("restaurant_id", "name")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        restaurant = Menu.objects.filter(restaurant_id=duplicate["restaurant_id"])
+        taken = set(restaurant.values_list("name", flat=True))
+        items = restaurant.filter(name=duplicate["name"]).order_by("id")[1:]
+        suffix = 2
+        for item in items:
+            while True:
+                tail = f" ({suffix})"
+                name = item.name[: 255 - len(tail)] + tail
+                suffix += 1
+                if name not in taken:
+                    break
+            taken.add(name)
+            item.name = name
+            item.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_menu_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='menu',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'name'), name='unique_menu_name_per_restaurant'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 15:00
+
+from django.db import migrations
+
+TABLES = {
+    "restaurants_restaurants_fts": "restaurants_restaurants",
+    "restaurants_menu_fts": "restaurants_menu",
+}
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, source in TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            "name, description, prefix='2 3', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {table} (rowid, name, description) "
+            f"SELECT id, name, description FROM {source}"
+        )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table in TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurants", "0005_menu_unique_name"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
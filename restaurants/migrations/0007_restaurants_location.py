@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-18 15:01
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurants", "0006_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="restaurants",
+            name="geohash",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="restaurants",
+            name="latitude",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(-90),
+                    django.core.validators.MaxValueValidator(90),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="restaurants",
+            name="longitude",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(-180),
+                    django.core.validators.MaxValueValidator(180),
+                ],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurants",
+            index=models.Index(
+                fields=["geohash"], name="restaurants_geohash_9398f2_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 15:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurants", "0007_restaurants_location"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="menu",
+            index=models.Index(
+                fields=["restaurant", "is_available"],
+                name="restaurants_restaur_2e1372_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurants",
+            index=models.Index(
+                fields=["owner", "name"], name="restaurants_owner_i_4c90a1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurants",
+            index=models.Index(
+                fields=["owner", "created_at", "id"],
+                name="restaurants_owner_i_e5ee8e_idx",
+            ),
+        ),
+    ]
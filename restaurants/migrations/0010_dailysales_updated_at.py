@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurants", "0009_dailysales"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailysales",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,156 @@
+import hashlib
+
+from django.db import transaction
+from django.http import Http404
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class CachedObjectMixin:
+    """
+    Memoizes ``get_object()`` for the request, so a verb and the hooks it
+    calls (``perform_update``, ``perform_destroy``, permission checks) share
+    one lookup. A view instance only lives for one request, so nothing is
+    kept across requests. Views customise the lookup through
+    ``get_queryset()`` and ``lookup_url_kwarg`` rather than by overriding
+    ``get_object()``.
+    """
+
+    def get_object(self):
+        if not hasattr(self, "_object"):
+            self._object = super().get_object()
+        return self._object
+
+
+class ConditionalDetailMixin:
+    """
+    ETag / Last-Modified support for detail views, derived from ``updated_at``.
+
+    The validators come from one ``values_list`` query over the object's
+    timestamps (plus any ``get_validator_annotations()``), so a matching
+    ``If-None-Match`` / ``If-Modified-Since`` is answered with a 304 before
+    the object is loaded or serialized. ``If-Match`` / ``If-Unmodified-Since``
+    on PUT and PATCH are checked under a row lock and fail with a 412 when
+    someone else changed the object first.
+
+    Views implement ``get_validator_queryset()``, returning a queryset
+    filtered down to the object the view would serve.
+    """
+
+    def get_validator_queryset(self):
+        raise NotImplementedError
+
+    def get_validator_annotations(self):
+        return {}
+
+    def get_validators(self):
+        annotations = self.get_validator_annotations()
+        row = (
+            self.get_validator_queryset()
+            .order_by()
+            .annotate(**annotations)
+            .values_list("updated_at", *annotations)
+            .first()
+        )
+        if row is None:
+            raise Http404
+        # Owners and customers get different representations of one object.
+        key = ":".join([self.request.user.role, *map(str, row)])
+        etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+        last_modified = max(value for value in row if hasattr(value, "timestamp"))
+        return etag, int(last_modified.timestamp())
+
+    def validator_headers(self, etag, last_modified):
+        return {"ETag": etag, "Last-Modified": http_date(last_modified)}
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            etags = [tag.removeprefix("W/") for tag in parse_etags(if_none_match)]
+            return "*" in etags or etag in etags
+        since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        return since is not None and last_modified <= since
+
+    def precondition_failed(self, request, etag, last_modified):
+        if_match = request.headers.get("If-Match")
+        if if_match is not None:
+            etags = parse_etags(if_match)
+            return "*" not in etags and etag not in etags
+        since = parse_http_date_safe(request.headers.get("If-Unmodified-Since", ""))
+        return since is not None and last_modified > since
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        headers = self.validator_headers(etag, last_modified)
+        if self.is_not_modified(request, etag, last_modified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response = super().get(request, *args, **kwargs)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def put(self, request, *args, **kwargs):
+        return self.conditional_update(super().put, request, *args, **kwargs)
+
+    def patch(self, request, *args, **kwargs):
+        return self.conditional_update(super().patch, request, *args, **kwargs)
+
+    def conditional_update(self, handler, request, *args, **kwargs):
+        if not {"If-Match", "If-Unmodified-Since"} & set(request.headers):
+            return handler(request, *args, **kwargs)
+
+        with transaction.atomic():
+            # Lock the row so nobody can write between the check and the save.
+            list(
+                self.get_validator_queryset()
+                .order_by()
+                .select_for_update()
+                .values_list("pk")
+            )
+            etag, last_modified = self.get_validators()
+            if self.precondition_failed(request, etag, last_modified):
+                return Response(
+                    {
+                        "msg": "This item was changed by someone else, "
+                        "fetch it again before updating",
+                        "status": False,
+                    },
+                    status=status.HTTP_412_PRECONDITION_FAILED,
+                    headers=self.validator_headers(etag, last_modified),
+                )
+            response = handler(request, *args, **kwargs)
+
+        if status.is_success(response.status_code):
+            etag, last_modified = self.get_validators()
+            for header, value in self.validator_headers(etag, last_modified).items():
+                response[header] = value
+        return response
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=a,b`` renders only the named fields (``id`` is always kept) and
+    ``?expand=menu`` adds the nested menu to such a subset. Without
+    ``fields`` the full representation is returned. Only applies to GET, so
+    writes still validate every field.
+    """
+
+    expandable_fields = ("menu",)
+
+    def get_requested_fields(self):
+        raw = self.request.query_params.get("fields")
+        if self.request.method != "GET" or not raw:
+            return None
+        fields = {name.strip() for name in raw.split(",") if name.strip()}
+        expand = self.request.query_params.get("expand", "")
+        fields.update(
+            name.strip()
+            for name in expand.split(",")
+            if name.strip() in self.expandable_fields
+        )
+        return fields | {"id"}
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
@@ -1,7 +1,10 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 from users.models import User
 
+from . import geo
+
 
 # Create your models here.
 
@@ -12,12 +15,41 @@ class Restaurants(models.Model):
     description = models.TextField()
     address = models.TextField()
     phone_number = models.CharField(max_length=20)
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+    geohash = models.CharField(max_length=12, blank=True, default="", editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["geohash"]),
+            models.Index(fields=["owner", "name"]),
+            models.Index(fields=["owner", "created_at", "id"]),
+        ]
+
     def __str__(self):
         return f"{self.owner.first_name} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ""
+        else:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        super().save(*args, **kwargs)
+
 
 class Menu(models.Model):
     name = models.CharField(max_length=255)
@@ -31,5 +63,48 @@ class Menu(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["restaurant", "created_at", "id"]),
+            models.Index(fields=["restaurant", "is_available"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["restaurant", "name"], name="unique_menu_name_per_restaurant"
+            )
+        ]
+
     def __str__(self):
         return f"{self.name} belongs to this {self.restaurant.name}"
+
+
+class DailySales(models.Model):
+    """
+    Orders, units and revenue of one menu item on one day. Checkout adds to
+    these rows as orders are placed (see ``restaurants.analytics``), so the
+    owner dashboard never scans order items.
+    """
+
+    restaurant = models.ForeignKey(
+        Restaurants, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    menu_item = models.ForeignKey(
+        Menu, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["restaurant", "day"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["restaurant", "menu_item", "day"],
+                name="unique_daily_sales_per_menu_item",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} on {self.day}: {self.quantity} sold"
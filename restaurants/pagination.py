@@ -0,0 +1,130 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset (seek) pagination on a ``(timestamp, id)`` key.
+
+    Each page is fetched with ``WHERE (ts, id) < (cursor_ts, cursor_id)``
+    instead of an OFFSET, so the cost of a page does not depend on how deep
+    the client has paged. Newest first, or oldest first with
+    ``descending = False``. The views keep building their own
+    ``{"msg", "data", "status"}`` envelope and add ``next`` from
+    ``get_next_link()``.
+    """
+
+    timestamp_field = "created_at"
+    descending = True
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request)
+
+    def paginate_querysets(self, querysets, request):
+        """
+        One page over several querysets sharing the key, such as a table and
+        its archive: each is asked for one page past the cursor and the rows
+        are merged in key order.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        # Fetch one extra row to find out whether there is a next page.
+        results = []
+        for queryset in querysets:
+            results += self.seek(queryset, cursor)[: self.page_size + 1]
+        if len(querysets) > 1:
+            results.sort(key=self.get_key, reverse=self.descending)
+            results = results[: self.page_size + 1]
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def seek(self, queryset, cursor):
+        ts = self.timestamp_field
+        direction, after = ("-", "lt") if self.descending else ("", "gt")
+        queryset = queryset.order_by(f"{direction}{ts}", f"{direction}id")
+        if cursor is not None:
+            cursor_ts, cursor_id = cursor
+            # The plain bound on the timestamp lets the database seek to the
+            # cursor in the index; with only the OR it scans from the top.
+            queryset = queryset.filter(
+                Q(**{f"{ts}__{after}e": cursor_ts}),
+                Q(**{f"{ts}__{after}": cursor_ts}) | Q(**{f"id__{after}": cursor_id}),
+            )
+        return queryset
+
+    def get_key(self, instance):
+        return getattr(instance, self.timestamp_field), instance.pk
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            cursor_ts, cursor_id = json.loads(raw)
+            cursor_ts = datetime.fromisoformat(cursor_ts)
+        except (TypeError, ValueError, OverflowError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        # JSON numbers may also be floats, booleans or too big for a bigint.
+        if type(cursor_id) is not int or not 0 <= cursor_id < 2**63:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor_ts, cursor_id
+
+    def encode_cursor(self, instance):
+        timestamp, pk = self.get_key(instance)
+        key = [timestamp.isoformat(), pk]
+        raw = json.dumps(key, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "data": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "data": schema,
+            },
+        }
+
+
+class NearbyPagination(PageNumberPagination):
+    """Page-number pagination for distance-sorted ``?near=`` results."""
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
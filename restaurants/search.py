@@ -0,0 +1,154 @@
+"""
+Full-text search over restaurants and menu items.
+
+On SQLite the text lives in two FTS5 tables whose rowids are the primary keys
+of the indexed rows, so keeping them in sync is a rowid delete plus insert.
+Other backends fall back to ``icontains`` scans.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Menu, Restaurants
+
+RESTAURANTS_TABLE = "restaurants_restaurants_fts"
+MENU_TABLE = "restaurants_menu_fts"
+
+# Name matches outrank description matches.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r"\w+")
+
+CREATE_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+    "name, description, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+def is_enabled():
+    return connection.vendor == "sqlite"
+
+
+def create_tables(cursor):
+    for table in (RESTAURANTS_TABLE, MENU_TABLE):
+        cursor.execute(CREATE_TABLE_SQL.format(table=table))
+
+
+def drop_tables(cursor):
+    for table in (RESTAURANTS_TABLE, MENU_TABLE):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def _write(table, rows):
+    rows = [(row.pk, row.name, row.description) for row in rows]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {table} WHERE rowid = %s", [(pk,) for pk, _, _ in rows]
+        )
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, name, description) VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def _delete(table, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [pk])
+
+
+def index_restaurants(restaurants):
+    if is_enabled():
+        _write(RESTAURANTS_TABLE, restaurants)
+
+
+def index_menu_items(items):
+    if is_enabled():
+        _write(MENU_TABLE, items)
+
+
+def unindex_restaurant(pk):
+    if is_enabled():
+        _delete(RESTAURANTS_TABLE, pk)
+
+
+def unindex_menu_item(pk):
+    if is_enabled():
+        _delete(MENU_TABLE, pk)
+
+
+def rebuild(cursor):
+    """Repopulate both FTS tables from the source tables."""
+    for table, source in (
+        (RESTAURANTS_TABLE, Restaurants._meta.db_table),
+        (MENU_TABLE, Menu._meta.db_table),
+    ):
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, name, description) "
+            f"SELECT id, name, description FROM {source}"
+        )
+        cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+
+
+def to_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    Words are quoted so user input can never be parsed as FTS5 syntax.
+    """
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(text.lower()))
+
+
+def _ranked_ids(sql, match, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _in_order(queryset, ids):
+    rows = queryset.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+def search_restaurants(text, limit):
+    match = to_match_query(text)
+    if not match:
+        return []
+    if not is_enabled():
+        matches = Restaurants.objects.filter(
+            Q(name__icontains=text) | Q(description__icontains=text)
+        )
+        return list(matches.order_by("name")[:limit])
+    ids = _ranked_ids(
+        f"SELECT rowid FROM {RESTAURANTS_TABLE} WHERE {RESTAURANTS_TABLE} MATCH %s "
+        f"ORDER BY bm25({RESTAURANTS_TABLE}, %s, %s) LIMIT %s",
+        match,
+        limit,
+    )
+    return _in_order(Restaurants.objects.all(), ids)
+
+
+def search_menu(text, limit):
+    """Ranked available menu items matching ``text``."""
+    match = to_match_query(text)
+    if not match:
+        return []
+    available = Menu.objects.filter(is_available=True)
+    if not is_enabled():
+        matches = available.filter(
+            Q(name__icontains=text) | Q(description__icontains=text)
+        )
+        return list(matches.order_by("name")[:limit])
+    ids = _ranked_ids(
+        f"SELECT {MENU_TABLE}.rowid FROM {MENU_TABLE} "
+        f"JOIN {Menu._meta.db_table} m ON m.id = {MENU_TABLE}.rowid "
+        f"WHERE {MENU_TABLE} MATCH %s AND m.is_available "
+        f"ORDER BY bm25({MENU_TABLE}, %s, %s) LIMIT %s",
+        match,
+        limit,
+    )
+    return _in_order(available, ids)
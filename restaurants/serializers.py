@@ -1,13 +1,43 @@
 from rest_framework import serializers
 
+from .bulk import write_menu_items
 from .models import Restaurants, Menu
 
 
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    Takes an extra ``fields`` argument naming the subset of fields to render;
+    ``None`` keeps every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class MenuSerializer(serializers.ModelSerializer):
     class Meta:
         model = Menu
         fields = ["id", "name", "price", "description", "is_available"]
 
+    def validate_name(self, name):
+        # New items are checked by MenuView; a rename must not collide either.
+        menu = self.instance
+        if (
+            isinstance(menu, Menu)
+            and name != menu.name
+            and Menu.objects.filter(
+                restaurant_id=menu.restaurant_id, name=name
+            ).exists()
+        ):
+            raise serializers.ValidationError(
+                "You already have a menu item with this name."
+            )
+        return name
+
 
 class MenuDetailSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,18 +46,73 @@ class MenuDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "name", "price", "description"]
 
 
-class RestaurantsSerializer(serializers.ModelSerializer):
+class MenuImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Menu
+        fields = ["name", "description", "price", "is_available", "quantity"]
+
+
+class MenuBulkUpdateSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField()
+
+    class Meta:
+        model = Menu
+        fields = ["id", "price", "is_available", "quantity"]
+        extra_kwargs = {
+            "price": {"required": False},
+            "is_available": {"required": False},
+            "quantity": {"required": False},
+        }
+
+    def validate(self, attrs):
+        if len(attrs) < 2:
+            raise serializers.ValidationError(
+                "Change at least one of price, is_available or quantity."
+            )
+        return attrs
+
+
+class MenuSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Menu
+        fields = ["id", "name", "price", "description", "restaurant"]
+
+
+class RestaurantsSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Restaurants
+        fields = ["id", "name", "description", "address"]
+
+
+class RestaurantsSerializer(DynamicFieldsModelSerializer):
     menu = MenuSerializer(many=True, required=False)
 
     class Meta:
         model = Restaurants
-        fields = ["id", "name", "description", "address", "phone_number", "menu"]
+        fields = [
+            "id",
+            "name",
+            "description",
+            "address",
+            "phone_number",
+            "latitude",
+            "longitude",
+            "menu",
+        ]
+
+    def validate(self, attrs):
+        latitude = attrs.get("latitude", getattr(self.instance, "latitude", None))
+        longitude = attrs.get("longitude", getattr(self.instance, "longitude", None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError(
+                "Provide both latitude and longitude, or neither."
+            )
+        return attrs
 
     def create(self, validated_data):
         menu_data = validated_data.pop("menu", [])
         restaurant = Restaurants.objects.create(
             owner=self.context["request"].user, **validated_data
         )
-        for item in menu_data:
-            Menu.objects.create(restaurant=restaurant, **item)
+        write_menu_items(restaurant, menu_data)
         return restaurant
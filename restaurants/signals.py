@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .cache import bump_menu_version
+from .models import Menu, Restaurants
+
+SEARCHABLE_FIELDS = {"name", "description"}
+
+
+def touches_search(update_fields):
+    return update_fields is None or bool(SEARCHABLE_FIELDS & set(update_fields))
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def invalidate_menu_cache(sender, instance, **kwargs):
+    # After commit, so no reader can cache the old rows under the new version.
+    restaurant_id = instance.restaurant_id
+    transaction.on_commit(lambda: bump_menu_version(restaurant_id))
+
+
+@receiver(post_save, sender=Menu)
+def index_menu_item(sender, instance, update_fields=None, **kwargs):
+    if touches_search(update_fields):
+        search.index_menu_items([instance])
+
+
+@receiver(post_delete, sender=Menu)
+def unindex_menu_item(sender, instance, **kwargs):
+    search.unindex_menu_item(instance.pk)
+
+
+@receiver(post_save, sender=Restaurants)
+def index_restaurant(sender, instance, update_fields=None, **kwargs):
+    if touches_search(update_fields):
+        search.index_restaurants([instance])
+
+
+@receiver(post_delete, sender=Restaurants)
+def unindex_restaurant(sender, instance, **kwargs):
+    search.unindex_restaurant(instance.pk)
@@ -1,3 +1,887 @@
-from django.test import TestCase
+import base64
+import csv
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.generics import GenericAPIView
+from rest_framework.test import APITestCase
+
+from carts.models import Cart
+from multi_restaurant_alx_captsone.testing import (
+    WITHOUT_SILK,
+    make_menu,
+    make_restaurant,
+    make_user,
+)
+from orders.models import ArchivedOrder, Order
+
+from . import geo
+from .analytics import record_sales
+from .bulk import write_menu_items
+from .cache import get_menu_version
+from .management.commands.rebuild_sales_rollups import create_staging_table
+from .models import DailySales, Menu, Restaurants
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class RestaurantsPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.customer = make_user("customer@example.com")
+        cls.restaurants = [
+            make_restaurant(cls.owner, f"Restaurant {i}") for i in range(25)
+        ]
+        cls.restaurant = cls.restaurants[0]
+        for i in range(7):
+            make_menu(cls.restaurant, f"Dish {i}")
+
+    def collect_pages(self, url):
+        ids, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data["status"])
+            ids.extend(item["id"] for item in response.data["data"])
+            queries.append(ctx.captured_queries)
+            url = response.data["next"]
+        return ids, queries
+
+    def test_restaurants_list_walks_every_row_once_newest_first(self):
+        self.client.force_authenticate(self.customer)
+        ids, _ = self.collect_pages("/restaurants/api/?page_size=10")
+        expected = [r.id for r in reversed(self.restaurants)]
+        self.assertEqual(ids, expected)
+
+    def test_restaurants_list_is_capped_at_page_size(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get("/restaurants/api/")
+        self.assertEqual(len(response.data["data"]), 20)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_deep_pages_seek_instead_of_offset(self):
+        self.client.force_authenticate(self.customer)
+        _, pages = self.collect_pages("/restaurants/api/?page_size=5")
+        self.assertEqual(len(pages), 5)
+        # Every page costs the same number of queries and never uses OFFSET,
+        # so latency stays flat no matter how deep the client pages.
+        self.assertEqual(len({len(queries) for queries in pages}), 1)
+        for queries in pages:
+            for query in queries:
+                self.assertNotIn("OFFSET", query["sql"].upper())
+
+    def test_menu_list_is_paginated(self):
+        self.client.force_authenticate(self.customer)
+        url = f"/restaurants/api/{self.restaurant.id}/menu/?page_size=3"
+        ids, pages = self.collect_pages(url)
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+        self.assertEqual(len(pages), 3)
+
+    def test_invalid_cursor_returns_404(self):
+        self.client.force_authenticate(self.customer)
+        ts = "2020-01-01T00:00:00+00:00"
+        for cursor in [
+            "not-a-cursor",
+            *(
+                base64.urlsafe_b64encode(raw.encode()).decode()
+                for raw in [
+                    f'["{ts}", 1e400]',
+                    f'["{ts}", 1.5]',
+                    f'["{ts}", "1"]',
+                    f'["{ts}", true]',
+                    f'["{ts}", {2**63}]',
+                    f'["{ts}"]',
+                    '["yesterday", 1]',
+                    "[1e400, 1]",
+                ]
+            ),
+        ]:
+            with self.subTest(cursor):
+                response = self.client.get(f"/restaurants/api/?cursor={cursor}")
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class RestaurantsMenuPrefetchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.customer = make_user("customer@example.com")
+        cls.restaurant = make_restaurant(cls.owner)
+        make_menu(cls.restaurant, "Available")
+        make_menu(cls.restaurant, "Sold out", is_available=False)
+
+    def add_restaurants(self, count):
+        for i in range(count):
+            restaurant = make_restaurant(self.owner, f"Extra {i}")
+            make_menu(restaurant, "Dish")
+            make_menu(restaurant, "Hidden", is_available=False)
+
+    def assert_constant_queries(self, user, url, queries=2):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(queries):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_restaurants(10)
+        with self.assertNumQueries(queries):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    # One query for the restaurants and one for all of their menus.
+    def test_list_query_count_is_constant_for_customers(self):
+        self.assert_constant_queries(self.customer, "/restaurants/api/")
+
+    def test_list_query_count_is_constant_for_owners(self):
+        self.assert_constant_queries(self.owner, "/restaurants/api/")
+
+    def test_detail_query_count_is_constant(self):
+        # Plus the cheap lookup of the ETag / Last-Modified validators.
+        url = f"/restaurants/api/{self.restaurant.id}/"
+        self.assert_constant_queries(self.customer, url, queries=3)
+        self.assert_constant_queries(self.owner, url, queries=3)
+
+    def test_customers_only_see_available_menu_items(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get(f"/restaurants/api/{self.restaurant.id}/")
+        names = [item["name"] for item in response.data["data"]["menu"]]
+        self.assertEqual(names, ["Available"])
+
+    def test_owners_see_every_menu_item(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(f"/restaurants/api/{self.restaurant.id}/")
+        names = [item["name"] for item in response.data["data"]["menu"]]
+        self.assertEqual(names, ["Available", "Sold out"])
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class MenuImportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.restaurant = make_restaurant(cls.owner)
+        cls.url = f"/restaurants/api/{cls.restaurant.id}/menu/import/"
+
+    def setUp(self):
+        self.client.force_authenticate(self.owner)
+
+    def upload(self, name, content):
+        if isinstance(content, str):
+            content = content.encode()
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(self.url, {"file": upload}, format="multipart")
+
+    def test_csv_import_upserts_by_name_and_reports_bad_lines(self):
+        make_menu(self.restaurant, "Jollof", price="5.00", quantity=3)
+        response = self.upload(
+            "menu.csv",
+            "name,description,price,quantity\n"
+            "Jollof,Smoky,12.50,9\n"
+            "Waakye,Beans and rice,8.00,4\n"
+            "Kenkey,Fermented corn,not-a-price,1\n",
+        )
+        self.assertEqual(response.status_code, 200)
+        report = response.data["data"]
+        self.assertEqual((report["created"], report["updated"]), (1, 1))
+        self.assertEqual(len(report["errors"]), 1)
+        self.assertEqual(report["errors"][0]["line"], 4)
+        self.assertIn("price", report["errors"][0]["errors"])
+
+        jollof = Menu.objects.get(restaurant=self.restaurant, name="Jollof")
+        self.assertEqual((str(jollof.price), jollof.quantity), ("12.50", 9))
+        self.assertEqual(self.restaurant.menu.count(), 2)
+
+    def test_ndjson_import_keeps_fields_missing_from_the_row(self):
+        make_menu(self.restaurant, "Banku", price="5.00", quantity=7)
+        response = self.upload(
+            "menu.ndjson",
+            '{"name": "Banku", "description": "Okro", "price": "6.00"}\n'
+            "\n"
+            "not json\n",
+        )
+        report = response.data["data"]
+        self.assertEqual((report["created"], report["updated"]), (0, 1))
+        self.assertEqual([error["line"] for error in report["errors"]], [3])
+        banku = Menu.objects.get(restaurant=self.restaurant, name="Banku")
+        self.assertEqual((str(banku.price), banku.quantity), ("6.00", 7))
+
+    def test_lines_that_are_not_utf8_are_reported(self):
+        uploads = [
+            ("menu.csv", b"name,description,price\nCaf\xe9,x,1.00\nJollof,x,5.00\n"),
+            (
+                "menu.ndjson",
+                b'{"name": "Caf\xe9", "description": "x", "price": "1.00"}\n'
+                b'{"name": "Jollof", "description": "x", "price": "5.00"}\n',
+            ),
+        ]
+        for name, content in uploads:
+            with self.subTest(name):
+                response = self.upload(name, content)
+                self.assertEqual(response.status_code, 200)
+                report = response.data["data"]
+                self.assertEqual(report["error_count"], 1)
+                self.assertEqual(
+                    report["errors"][0]["errors"],
+                    {"non_field_errors": ["Line is not valid UTF-8."]},
+                )
+                self.assertEqual(
+                    list(self.restaurant.menu.values_list("name", flat=True)),
+                    ["Jollof"],
+                )
+
+    def test_malformed_csv_lines_are_reported(self):
+        huge = "x" * (csv.field_size_limit() + 1)
+        response = self.upload(
+            "menu.csv", f"name,description,price\nBanku,{huge},1.00\nJollof,x,5.00\n"
+        )
+        self.assertEqual(response.status_code, 200)
+        report = response.data["data"]
+        self.assertEqual((report["created"], report["error_count"]), (1, 1))
+        self.assertIn(
+            "Invalid CSV", report["errors"][0]["errors"]["non_field_errors"][0]
+        )
+
+    def test_report_describes_only_the_first_errors(self):
+        rows = "".join(f"Dish {i},Tasty,free\n" for i in range(5))
+        with mock.patch("restaurants.importers.MAX_REPORTED_ERRORS", 2):
+            response = self.upload("menu.csv", "name,description,price\n" + rows)
+        report = response.data["data"]
+        self.assertEqual(report["error_count"], 5)
+        self.assertEqual([error["line"] for error in report["errors"]], [2, 3])
+
+    def test_import_writes_in_batches(self):
+        rows = "".join(f"Dish {i},Tasty,1.00\n" for i in range(1200))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.upload("menu.csv", "name,description,price\n" + rows)
+        self.assertEqual(response.data["data"]["created"], 1200)
+        sql = [q["sql"] for q in ctx.captured_queries]
+        # One existence lookup per batch of 500 rows; the backend may split a
+        # batch's INSERT further to respect its bound-parameter limit.
+        lookups = [q for q in sql if q.startswith('SELECT "restaurants_menu"."name"')]
+        self.assertEqual(len(lookups), 3)
+        self.assertLess(len([q for q in sql if q.startswith("INSERT")]), 50)
+
+    def test_rejects_unknown_file_types(self):
+        response = self.upload("menu.xlsx", "")
+        self.assertEqual(response.status_code, 400)
+
+    def test_customers_cannot_import(self):
+        self.client.force_authenticate(make_user("customer@example.com"))
+        response = self.upload("menu.csv", "name,description,price\n")
+        self.assertEqual(response.status_code, 403)
+
+    def test_nested_create_uses_batched_writer(self):
+        menu = [
+            {"name": f"Dish {i}", "description": "Tasty", "price": "1.00"}
+            for i in range(20)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                "/restaurants/api/",
+                {
+                    "name": "Chain",
+                    "description": "Many branches",
+                    "address": "Accra",
+                    "phone_number": "0200000000",
+                    "menu": menu,
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        menu_inserts = [
+            q
+            for q in ctx.captured_queries
+            if q["sql"].startswith('INSERT INTO "restaurants_menu"')
+        ]
+        self.assertEqual(len(menu_inserts), 1)
+        self.assertEqual(len(response.data["data"]["menu"]), 20)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class MenuCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.customer = make_user("customer@example.com")
+        cls.restaurant = make_restaurant(cls.owner)
+        cls.dish = make_menu(cls.restaurant, "Jollof")
+        cls.url = f"/restaurants/api/{cls.restaurant.id}/menu/"
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.customer)
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_if_none_match_returns_304_without_queries(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_menu_writes_invalidate_the_cache(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dish.price = "99.00"
+            self.dish.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["data"][0]["price"], "99.00")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dish.delete()
+        self.assertEqual(self.client.get(self.url).data["data"], [])
+
+    def test_menu_writes_bump_the_version_on_commit(self):
+        version = get_menu_version(self.restaurant.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.dish.price = "99.00"
+            self.dish.save()
+        self.assertEqual(get_menu_version(self.restaurant.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_menu_version(self.restaurant.id), version)
+
+    def test_import_bumps_the_version(self):
+        etag = self.client.get(self.url)["ETag"]
+        write_menu_items(
+            self.restaurant,
+            [{"name": "Waakye", "description": "Beans", "price": "8.00"}],
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), 2)
+
+    def test_owners_bypass_the_cache(self):
+        self.client.force_authenticate(self.owner)
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertNotIn("ETag", response)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class SearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.customer = make_user("customer@example.com")
+        cls.buka = make_restaurant(cls.owner, "Jollof Palace")
+        cls.grill = make_restaurant(cls.owner, "Osu Grill")
+        cls.jollof = make_menu(cls.grill, "Smoky jollof")
+        cls.waakye = make_menu(cls.buka, "Waakye", description="Served with jollof")
+        make_menu(cls.buka, "Jollof special", is_available=False)
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def search(self, query):
+        response = self.client.get("/restaurants/api/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        data = response.data["data"]
+        return (
+            [item["name"] for item in data["restaurants"]],
+            [item["name"] for item in data["menu"]],
+        )
+
+    def test_ranks_name_matches_above_description_matches(self):
+        restaurants, menu = self.search("jollof")
+        self.assertEqual(restaurants, ["Jollof Palace"])
+        self.assertEqual(menu, ["Smoky jollof", "Waakye"])
+
+    def test_matches_word_prefixes(self):
+        self.assertEqual(self.search("smo jol")[1], ["Smoky jollof"])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.jollof.name = "Red red"
+        self.jollof.save()
+        self.assertEqual(self.search("red")[1], ["Red red"])
+        self.assertEqual(self.search("smoky")[1], [])
+
+        self.grill.delete()
+        self.assertEqual(self.search("osu")[0], [])
+        self.assertEqual(self.search("red")[1], [])
+
+    def test_bulk_writes_are_indexed(self):
+        write_menu_items(
+            self.grill,
+            [{"name": "Kelewele", "description": "Spicy plantain", "price": "5.00"}],
+        )
+        self.assertEqual(self.search("plantain")[1], ["Kelewele"])
+
+    def test_query_syntax_is_not_interpreted(self):
+        restaurants, menu = self.search('jollof") * (')
+        self.assertEqual(restaurants, ["Jollof Palace"])
+        self.assertEqual(menu, ["Smoky jollof", "Waakye"])
+
+    def test_empty_query_is_rejected(self):
+        response = self.client.get("/restaurants/api/search/", {"q": " ?! "})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_command_restores_the_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM restaurants_menu_fts")
+        self.assertEqual(self.search("waakye")[1], [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("waakye")[1], ["Waakye"])
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class NearbyRestaurantsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.customer = make_user("customer@example.com")
+        places = {
+            "Osu": (5.5560, -0.1769),
+            "Labadi": (5.5600, -0.1450),
+            "Kumasi": (6.6885, -1.6244),
+            "North": (0.0010, 0.0010),
+            "South": (-0.0010, -0.0010),
+        }
+        for name, (latitude, longitude) in places.items():
+            restaurant = make_restaurant(cls.owner, name)
+            restaurant.latitude, restaurant.longitude = latitude, longitude
+            restaurant.save()
+        make_restaurant(cls.owner, "Nowhere")
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def nearby(self, near, **params):
+        response = self.client.get("/restaurants/api/", {"near": near, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_results_are_sorted_by_distance_within_radius(self):
+        data = self.nearby("5.5570,-0.1700", radius=5)["data"]
+        self.assertEqual([item["name"] for item in data], ["Osu", "Labadi"])
+        self.assertLess(data[0]["distance_km"], data[1]["distance_km"])
+        self.assertLessEqual(data[1]["distance_km"], 5)
+
+    def test_matches_across_geohash_cell_boundaries(self):
+        self.assertNotEqual(geo.encode(0.001, 0.001, 1), geo.encode(-0.001, -0.001, 1))
+        data = self.nearby("0,0", radius=1)["data"]
+        self.assertEqual({item["name"] for item in data}, {"North", "South"})
+
+    def test_nearby_results_are_paginated(self):
+        first = self.nearby("5.5570,-0.1700", radius=5, page_size=1)
+        self.assertEqual([item["name"] for item in first["data"]], ["Osu"])
+        second = self.client.get(first["next"]).data
+        self.assertEqual([item["name"] for item in second["data"]], ["Labadi"])
+        self.assertIsNone(second["next"])
+
+    def test_candidates_are_pruned_with_the_geohash_index(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.nearby("5.5570,-0.1700", radius=5)
+        sql = ctx.captured_queries[0]["sql"]
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("restaurants_geohash", plan)
+
+    def test_rejects_malformed_near(self):
+        for params in ({"near": "abc"}, {"near": "5,5", "radius": "500"}):
+            response = self.client.get("/restaurants/api/", params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_geohash_follows_coordinates(self):
+        restaurant = Restaurants.objects.get(name="Osu")
+        self.assertEqual(restaurant.geohash, geo.encode(5.5560, -0.1769))
+        restaurant.latitude = restaurant.longitude = None
+        restaurant.save()
+        self.assertEqual(Restaurants.objects.get(name="Osu").geohash, "")
+
+
+class IndexAdvisorTests(TestCase):
+    def test_restaurant_menu_and_order_queries_use_indexes(self):
+        out = StringIO()
+        call_command("index_advisor", stdout=out)
+        report = out.getvalue()
+        for view in (
+            "RestaurantsView",
+            "RestaurantsDetailView",
+            "MenuView",
+            "OrderCreateView",
+            "IncomingOrdersView",
+        ):
+            for role in ("owner", "customer"):
+                self.assertRegex(report, rf"{view} \[{role}\] \S+: ok")
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class MenuBulkUpdateTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.restaurant = make_restaurant(cls.owner)
+        cls.items = [make_menu(cls.restaurant, f"Dish {i}") for i in range(5)]
+        cls.other = make_menu(make_restaurant(cls.owner, "Other"), "Elsewhere")
+        cls.url = f"/restaurants/api/{cls.restaurant.id}/menu/bulk/"
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.owner)
+
+    def patch(self, changes):
+        return self.client.patch(self.url, changes, format="json")
+
+    def test_applies_every_change_in_one_update(self):
+        changes = [
+            {"id": item.id, "is_available": False, "quantity": 3} for item in self.items
+        ]
+        changes[0]["price"] = "12.50"
+        version = get_menu_version(self.restaurant.id)
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.patch(changes)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), 5)
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(get_menu_version(self.restaurant.id), version + 1)
+
+        items = Menu.objects.filter(restaurant=self.restaurant).order_by("id")
+        self.assertEqual(
+            [(str(i.price), i.is_available, i.quantity) for i in items],
+            [("12.50", False, 3)] + [("10.00", False, 3)] * 4,
+        )
+
+    def test_foreign_items_reject_the_whole_batch(self):
+        response = self.patch(
+            [
+                {"id": self.items[0].id, "quantity": 9},
+                {"id": self.other.id, "quantity": 9},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"]["missing"], [self.other.id])
+        self.assertEqual(
+            Menu.objects.get(pk=self.items[0].id).quantity, self.items[0].quantity
+        )
+
+    def test_rejects_changes_without_fields(self):
+        response = self.patch([{"id": self.items[0].id}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_customers_cannot_bulk_update(self):
+        self.client.force_authenticate(make_user("customer@example.com"))
+        response = self.patch([{"id": self.items[0].id, "quantity": 1}])
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class ConditionalDetailTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.customer = make_user("customer@example.com")
+        cls.restaurant = make_restaurant(cls.owner)
+        cls.dish = make_menu(cls.restaurant, "Jollof")
+        cls.restaurant_url = f"/restaurants/api/{cls.restaurant.id}/"
+        cls.menu_url = f"/restaurants/api/{cls.restaurant.id}/menu/{cls.dish.id}/"
+
+    def test_matching_etag_returns_304_after_one_query(self):
+        self.client.force_authenticate(self.customer)
+        for url in (self.restaurant_url, self.menu_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Last-Modified", response)
+            with self.assertNumQueries(1):
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(cached.status_code, 304)
+
+    def test_if_modified_since_returns_304(self):
+        self.client.force_authenticate(self.customer)
+        last_modified = self.client.get(self.menu_url)["Last-Modified"]
+        response = self.client.get(self.menu_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_menu_changes_change_the_restaurant_etag(self):
+        self.client.force_authenticate(self.customer)
+        etag = self.client.get(self.restaurant_url)["ETag"]
+        make_menu(self.restaurant, "Waakye")
+        response = self.client.get(self.restaurant_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]["menu"]), 2)
+
+    def test_owners_and_customers_get_different_etags(self):
+        self.client.force_authenticate(self.customer)
+        customer_etag = self.client.get(self.menu_url)["ETag"]
+        self.client.force_authenticate(self.owner)
+        self.assertNotEqual(self.client.get(self.menu_url)["ETag"], customer_etag)
+
+    def test_stale_if_match_prevents_lost_updates(self):
+        self.client.force_authenticate(self.owner)
+        etag = self.client.get(self.menu_url)["ETag"]
+        self.dish.price = "11.00"
+        self.dish.save()
+
+        response = self.client.patch(
+            self.menu_url, {"price": "20.00"}, format="json", HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(str(Menu.objects.get(pk=self.dish.pk).price), "11.00")
+
+        current = response["ETag"]
+        response = self.client.patch(
+            self.menu_url, {"price": "20.00"}, format="json", HTTP_IF_MATCH=current
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], current)
+        self.assertEqual(str(Menu.objects.get(pk=self.dish.pk).price), "20.00")
+
+    def test_menu_detail_looks_items_up_within_the_restaurant(self):
+        self.client.force_authenticate(self.customer)
+        other = make_restaurant(self.owner, "Other")
+        url = f"/restaurants/api/{other.id}/menu/{self.dish.id}/"
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class SparseFieldsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.customer = make_user("customer@example.com")
+        cls.restaurant = make_restaurant(cls.owner, "Buka")
+        make_menu(cls.restaurant, "Jollof")
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def test_fields_limit_payload_and_skip_menu_and_text_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/restaurants/api/", {"fields": "name"})
+        self.assertEqual(
+            response.data["data"], [{"id": self.restaurant.id, "name": "Buka"}]
+        )
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"address"', sql)
+
+    def test_expand_adds_the_menu_to_a_subset(self):
+        response = self.client.get(
+            "/restaurants/api/", {"fields": "name", "expand": "menu"}
+        )
+        item = response.data["data"][0]
+        self.assertEqual(set(item), {"id", "name", "menu"})
+        self.assertEqual([dish["name"] for dish in item["menu"]], ["Jollof"])
+
+    def test_detail_honours_fields(self):
+        url = f"/restaurants/api/{self.restaurant.id}/"
+        response = self.client.get(url, {"fields": "name,address"})
+        self.assertEqual(set(response.data["data"]), {"id", "name", "address"})
+
+    def test_full_payload_without_fields(self):
+        response = self.client.get("/restaurants/api/")
+        self.assertIn("menu", response.data["data"][0])
+        self.assertIn("description", response.data["data"][0])
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class DetailLookupTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.restaurant = make_restaurant(cls.owner)
+
+    def setUp(self):
+        self.menu = make_menu(self.restaurant)
+        self.url = f"/restaurants/api/{self.restaurant.id}/menu/{self.menu.id}/"
+        self.client.force_authenticate(self.owner)
+
+    def lookups(self):
+        return mock.patch.object(
+            GenericAPIView,
+            "get_object",
+            autospec=True,
+            side_effect=GenericAPIView.get_object,
+        )
+
+    def test_renaming_onto_another_item_is_rejected(self):
+        make_menu(self.restaurant, "Jollof")
+        response = self.client.patch(self.url, {"name": "Jollof"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("name", response.data)
+        self.menu.refresh_from_db()
+        self.assertEqual(self.menu.name, "Dish")
+
+    def test_each_verb_looks_the_menu_item_up_once(self):
+        # Beyond the lookup: GET reads the ETag validators, PATCH also saves
+        # and updates the search index, DELETE reads the cart lines to refund,
+        # cascades (to archived order items too) and unindexes.
+        for method, queries, body in [
+            ("get", 2, None),
+            ("patch", 4, {"price": "12.00"}),
+            ("delete", 8, None),
+        ]:
+            with self.subTest(method), self.lookups() as lookup:
+                with self.assertNumQueries(queries):
+                    getattr(self.client, method)(self.url, body, format="json")
+                self.assertEqual(lookup.call_count, 1)
+
+
+@override_settings(MIDDLEWARE=WITHOUT_SILK)
+class SalesAnalyticsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user("owner@example.com", role="owner")
+        cls.restaurant = make_restaurant(cls.owner)
+        cls.jollof = make_menu(cls.restaurant, "Jollof", price="10.00", quantity=100)
+        cls.suya = make_menu(cls.restaurant, "Suya", price="4.00", quantity=100)
+        cls.url = f"/restaurants/api/{cls.restaurant.id}/analytics/"
+
+    def order(self, email, quantities):
+        customer = make_user(email)
+        self.client.force_authenticate(customer)
+        cart = Cart.objects.create(user=customer)
+        cart.add_items({menu.id: n for menu, n in quantities.items()})
+        self.assertEqual(self.client.post("/orders/api/").status_code, 201)
+
+    def rollups(self):
+        return sorted(
+            DailySales.objects.values_list(
+                "menu_item", "day", "orders", "quantity", "revenue"
+            )
+        )
+
+    def test_checkout_feeds_the_dashboard(self):
+        self.order("a@example.com", {self.jollof: 2, self.suya: 1})
+        self.order("b@example.com", {self.suya: 3})
+
+        self.client.force_authenticate(self.owner)
+        with self.assertNumQueries(4):
+            # Restaurant, totals, per-day series, top sellers.
+            data = self.client.get(self.url).data["data"]
+        self.assertEqual(data["quantity"], 6)
+        self.assertEqual(data["revenue"], Decimal("36.00"))
+        self.assertEqual(len(data["by_day"]), 1)
+        self.assertEqual(
+            [
+                (row["name"], row["orders"], row["quantity"])
+                for row in data["top_sellers"]
+            ],
+            [("Suya", 2, 4), ("Jollof", 1, 2)],
+        )
+
+    def test_rebuild_reproduces_the_rollups(self):
+        self.order("a@example.com", {self.jollof: 2, self.suya: 1})
+        self.order("b@example.com", {self.suya: 3})
+        self.order("c@example.com", {self.jollof: 1})
+        expected = self.rollups()
+        DailySales.objects.update(quantity=0)
+
+        out = StringIO()
+        call_command("rebuild_sales_rollups", "--chunk-size", "2", stdout=out)
+
+        self.assertIn("from 3 orders in 2 chunks", out.getvalue())
+        self.assertEqual(self.rollups(), expected)
+
+    def test_rebuild_includes_archived_orders(self):
+        self.order("a@example.com", {self.jollof: 2, self.suya: 1})
+        self.order("b@example.com", {self.suya: 3})
+        self.order("c@example.com", {self.jollof: 1})
+        Order.objects.filter(user__email__in=["a@example.com", "b@example.com"]).update(
+            status="COMPLETED", order_date=timezone.now() - timedelta(days=40)
+        )
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        expected = self.rollups()
+
+        call_command("archive_orders", older_than=30, pause=0, stdout=StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        out = StringIO()
+        call_command("rebuild_sales_rollups", "--chunk-size", "2", stdout=out)
+
+        self.assertIn("from 3 orders in 2 chunks", out.getvalue())
+        self.assertEqual(self.rollups(), expected)
+
+    def test_orders_placed_during_a_rebuild_are_counted_once(self):
+        self.order("a@example.com", {self.jollof: 2})
+
+        def place_order_meanwhile():
+            create_staging_table()
+            self.order("b@example.com", {self.jollof: 3})
+
+        with mock.patch(
+            "restaurants.management.commands.rebuild_sales_rollups."
+            "create_staging_table",
+            side_effect=place_order_meanwhile,
+        ):
+            call_command("rebuild_sales_rollups", stdout=StringIO())
+
+        self.assertEqual(
+            self.rollups(), [(self.jollof.id, date.today(), 2, 5, Decimal("50.00"))]
+        )
+
+    def rebuild_while(self, change):
+        """Rebuild, calling ``change()`` once the first chunk is staged."""
+        calls = []
+
+        def stage_then_change(rows, **kwargs):
+            record_sales(rows, **kwargs)
+            if not calls:
+                calls.append(rows)
+                change()
+
+        with mock.patch(
+            "restaurants.management.commands.rebuild_sales_rollups.record_sales",
+            side_effect=stage_then_change,
+        ):
+            call_command("rebuild_sales_rollups", stdout=StringIO())
+
+    def test_orders_cancelled_during_a_rebuild_are_not_counted(self):
+        self.order("a@example.com", {self.jollof: 2})
+        self.order("b@example.com", {self.jollof: 3, self.suya: 1})
+        order = Order.objects.get(user__email="b@example.com")
+
+        def cancel():
+            self.client.force_authenticate(order.user)
+            response = self.client.post(
+                f"/orders/api/{order.id}/status/",
+                {"expected_status": "PENDING", "status": "CANCELLED"},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.rebuild_while(cancel)
+
+        self.assertEqual(
+            self.rollups(), [(self.jollof.id, date.today(), 1, 2, Decimal("20.00"))]
+        )
+
+    def test_orders_deleted_during_a_rebuild_are_not_counted(self):
+        self.order("a@example.com", {self.jollof: 2})
+        self.order("b@example.com", {self.jollof: 3, self.suya: 1})
+        order = Order.objects.get(user__email="b@example.com")
+
+        def delete():
+            self.client.force_authenticate(order.user)
+            response = self.client.delete(f"/orders/api/{order.id}/")
+            self.assertEqual(response.status_code, 200)
+
+        self.rebuild_while(delete)
+
+        self.assertEqual(
+            self.rollups(), [(self.jollof.id, date.today(), 1, 2, Decimal("20.00"))]
+        )
+
+    def test_only_the_owner_sees_the_numbers(self):
+        self.client.force_authenticate(make_user("someone@example.com"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
@@ -1,12 +1,29 @@
 from django.urls import path
 
-from .views import RestaurantsView, RestaurantsDetailView, MenuView, MenuDetailView
+from .views import (
+    RestaurantsView,
+    RestaurantsDetailView,
+    MenuView,
+    MenuImportView,
+    MenuBulkUpdateView,
+    MenuDetailView,
+    RestaurantAnalyticsView,
+    SearchView,
+)
 
 urlpatterns = [
     # Restaurants
     path("", RestaurantsView.as_view(), name="restaurants-list-create"),
+    path("search/", SearchView.as_view(), name="search"),
     path("<int:pk>/", RestaurantsDetailView.as_view(), name="restaurants-detail"),
+    path(
+        "<int:pk>/analytics/",
+        RestaurantAnalyticsView.as_view(),
+        name="restaurants-analytics",
+    ),
     # Menu for a specific restaurant
     path("<int:pk>/menu/", MenuView.as_view(), name="menu-list-create"),
+    path("<int:pk>/menu/import/", MenuImportView.as_view(), name="menu-import"),
+    path("<int:pk>/menu/bulk/", MenuBulkUpdateView.as_view(), name="menu-bulk-update"),
     path("<int:pk>/menu/<int:menu_pk>/", MenuDetailView.as_view(), name="menu-detail"),
 ]
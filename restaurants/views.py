@@ -1,22 +1,73 @@
-from drf_spectacular.utils import extend_schema
+from django.core.cache import cache
+from django.db.models import Count, Max, Prefetch, Q
+from django.utils.http import parse_etags
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import status
 from rest_framework.generics import (
+    GenericAPIView,
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
     get_object_or_404,
 )
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from .cache import (
+    MENU_CACHE_TIMEOUT,
+    get_menu_version,
+    menu_etag,
+    menu_payload_key,
+)
+from .analytics import sales_summary
+from .bulk import update_menu_items
+from .importers import import_menu, read_csv_rows, read_ndjson_rows
+from .mixins import CachedObjectMixin, ConditionalDetailMixin, SparseFieldsMixin
 from .models import Restaurants, Menu
-from .serializers import RestaurantsSerializer, MenuSerializer, MenuDetailSerializer
+from .pagination import KeysetCursorPagination, NearbyPagination
+from . import geo, search
+from .serializers import (
+    RestaurantsSerializer,
+    MenuSerializer,
+    MenuDetailSerializer,
+    MenuBulkUpdateSerializer,
+    MenuSearchSerializer,
+    RestaurantsSearchSerializer,
+)
+
+
+def restaurants_for(user, fields=None):
+    """
+    Restaurants visible to ``user`` with their menu prefetched in one query.
+    Owners see their own restaurants and every menu item; customers see all
+    restaurants but only available items.
+
+    ``fields`` is the sparse field set a client asked for: large text columns
+    outside it are deferred and the menu is only prefetched if it is in it.
+    """
+    if user.role == "owner":
+        restaurants = Restaurants.objects.filter(owner=user)
+        menu = Menu.objects.all()
+    else:
+        restaurants = Restaurants.objects.all()
+        menu = Menu.objects.filter(is_available=True)
+    if fields is None:
+        fields = {"description", "address", "menu"}
+    deferred = {"description", "address"} - fields
+    if deferred:
+        restaurants = restaurants.defer(*deferred)
+    if "menu" not in fields:
+        return restaurants
+    return restaurants.prefetch_related(
+        Prefetch("menu", queryset=menu.order_by("created_at", "id"))
+    )
 
 
 # ---------------- RESTAURANTS ----------------
 
 
 @extend_schema(tags=["Restaurants"])
-class RestaurantsView(ListCreateAPIView):
+class RestaurantsView(SparseFieldsMixin, ListCreateAPIView):
     """
     Unified API endpoint for restaurants.
     - Owners: list their restaurants and create new ones.
@@ -26,22 +77,96 @@ class RestaurantsView(ListCreateAPIView):
     queryset = Restaurants.objects.all()
     serializer_class = RestaurantsSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+
+    default_radius_km = 5.0
+    max_radius_km = 50.0
+
+    @property
+    def paginator(self):
+        # Distance-sorted results have no stable keyset, so ``?near=`` pages
+        # by number over the already pruned candidate list.
+        if not hasattr(self, "_paginator"):
+            if "near" in self.request.query_params:
+                self._paginator = NearbyPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == "owner":
-            return Restaurants.objects.filter(owner=user)
-        return Restaurants.objects.all()
+        return restaurants_for(self.request.user, self.get_requested_fields())
+
+    def get_near(self):
+        """Parse ``?near=lat,lon&radius=km``; returns None if malformed."""
+        params = self.request.query_params
+        try:
+            latitude, longitude = (float(value) for value in params["near"].split(","))
+            radius = float(params.get("radius", self.default_radius_km))
+        except ValueError:
+            return None
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return None
+        if not 0 < radius <= self.max_radius_km:
+            return None
+        return latitude, longitude, radius
+
+    def paginate_nearby(self, queryset, latitude, longitude, radius):
+        """
+        Prune candidates to the geohash cells around the point with index
+        range scans, then rank them by exact haversine distance.
+        """
+        cells = Q()
+        for cell in geo.covering_cells(latitude, longitude, radius):
+            cells |= Q(geohash__gte=cell, geohash__lt=cell + "~")
+        candidates = (
+            queryset.prefetch_related(None)
+            .filter(cells)
+            .values_list("id", "latitude", "longitude")
+        )
+        by_distance = sorted(
+            (distance, pk)
+            for pk, lat, lon in candidates
+            if (distance := geo.haversine_km(latitude, longitude, lat, lon)) <= radius
+        )
+        page = self.paginate_queryset(by_distance)
+        restaurants = queryset.in_bulk([pk for _, pk in page])
+        return [(restaurants[pk], distance) for distance, pk in page]
 
     def list(self, request, *args, **kwargs):
-        serializer = self.serializer_class(self.get_queryset(), many=True)
+        queryset = self.get_queryset()
+        if "near" in request.query_params:
+            near = self.get_near()
+            if near is None:
+                return Response(
+                    {
+                        "msg": "Use near=<lat>,<lon> and a radius in km up to "
+                        f"{self.max_radius_km:g}",
+                        "status": False,
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            page = self.paginate_nearby(queryset, *near)
+            serializer = self.get_serializer(
+                [restaurant for restaurant, _ in page], many=True
+            )
+            data = serializer.data
+            for item, (_, distance) in zip(data, page):
+                item["distance_km"] = round(distance, 3)
+        else:
+            page = self.paginate_queryset(queryset)
+            data = self.get_serializer(page, many=True).data
         msg = (
             "Your Restaurants"
             if request.user.role == "owner"
             else "Available Restaurants"
         )
         return Response(
-            {"msg": msg, "data": serializer.data, "status": True},
+            {
+                "msg": msg,
+                "data": data,
+                "next": self.paginator.get_next_link(),
+                "status": True,
+            },
             status=status.HTTP_200_OK,
         )
 
@@ -80,16 +205,27 @@ class RestaurantsView(ListCreateAPIView):
 
 
 @extend_schema(tags=["Restaurants"])
-class RestaurantsDetailView(RetrieveUpdateDestroyAPIView):
+class RestaurantsDetailView(
+    CachedObjectMixin,
+    ConditionalDetailMixin,
+    SparseFieldsMixin,
+    RetrieveUpdateDestroyAPIView,
+):
     serializer_class = RestaurantsSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_object(self):
-        pk = self.kwargs.get("pk")
-        user = self.request.user
-        if user.role == "owner":
-            return get_object_or_404(Restaurants, pk=pk, owner=user)
-        return get_object_or_404(Restaurants, pk=pk)
+    def get_queryset(self):
+        return restaurants_for(self.request.user, self.get_requested_fields())
+
+    def get_validator_queryset(self):
+        return self.get_queryset().prefetch_related(None).filter(pk=self.kwargs["pk"])
+
+    def get_validator_annotations(self):
+        # The payload embeds the menu, so its changes must change the ETag.
+        return {
+            "menu_updated_at": Max("menu__updated_at"),
+            "menu_count": Count("menu"),
+        }
 
     def retrieve(self, request, *args, **kwargs):
         response = super().retrieve(request, *args, **kwargs)
@@ -121,6 +257,99 @@ class RestaurantsDetailView(RetrieveUpdateDestroyAPIView):
         )
 
 
+# ---------------- ANALYTICS ----------------
+
+
+@extend_schema(parameters=[OpenApiParameter("days", int)], tags=["Restaurants"])
+class RestaurantAnalyticsView(GenericAPIView):
+    """
+    Sales dashboard for a restaurant's owner.
+
+    GET:
+        Units and revenue over the last ``days`` days (30 by default, at most
+        365), per day and in total, plus the ten best-selling menu items.
+        Reads only the daily rollups, never the orders.
+    """
+
+    permission_classes = [IsAuthenticated]
+    default_days = 30
+    max_days = 365
+
+    def get(self, request, *args, **kwargs):
+        restaurant = get_object_or_404(
+            Restaurants, pk=self.kwargs.get("pk"), owner=request.user
+        )
+        try:
+            days = int(request.query_params.get("days", self.default_days))
+        except ValueError:
+            days = self.default_days
+        days = min(max(days, 1), self.max_days)
+        return Response(
+            {
+                "msg": "Restaurant sales",
+                "data": sales_summary(restaurant, days),
+                "status": True,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+# ---------------- SEARCH ----------------
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter("q", str, required=True),
+        OpenApiParameter("limit", int),
+    ],
+    tags=["Search"],
+)
+class SearchView(GenericAPIView):
+    """
+    Ranked full-text search over restaurants and available menu items.
+
+    GET:
+        Every word in ``q`` must match, as a prefix, the name or description.
+        Name matches rank above description matches.
+    """
+
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 50
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "")
+        if not search.to_match_query(query):
+            return Response(
+                {"msg": "Provide a search query as 'q'", "status": False},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        limit = self.get_limit()
+        restaurants = search.search_restaurants(query, limit)
+        menu = search.search_menu(query, limit)
+        return Response(
+            {
+                "msg": "Search results",
+                "data": {
+                    "restaurants": RestaurantsSearchSerializer(
+                        restaurants, many=True
+                    ).data,
+                    "menu": MenuSearchSerializer(menu, many=True).data,
+                },
+                "status": True,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 # ---------------- MENU ----------------
 
 
@@ -133,6 +362,7 @@ class MenuView(ListCreateAPIView):
     """
 
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
 
     def get_serializer_class(self):
         return (
@@ -150,12 +380,35 @@ class MenuView(ListCreateAPIView):
             )
         return Menu.objects.filter(restaurant__id=restaurant_id, is_available=True)
 
+    def get_menu_payload(self):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return {
+            "msg": "Menu Items",
+            "data": serializer.data,
+            "next": self.paginator.get_next_link(),
+            "status": True,
+        }
+
     def list(self, request, *args, **kwargs):
-        serializer = self.get_serializer(self.get_queryset(), many=True)
-        return Response(
-            {"msg": "Menu Items", "data": serializer.data, "status": True},
-            status=status.HTTP_200_OK,
-        )
+        if request.user.role == "owner":
+            return Response(self.get_menu_payload(), status=status.HTTP_200_OK)
+
+        # Customers all see the same menu, so its serialized pages are cached
+        # under a version that Menu writes bump (see restaurants.signals).
+        restaurant_id = self.kwargs.get("pk")
+        version = get_menu_version(restaurant_id)
+        etag = menu_etag(restaurant_id, version)
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        key = menu_payload_key(restaurant_id, version, request.build_absolute_uri())
+        payload = cache.get(key)
+        if payload is None:
+            payload = self.get_menu_payload()
+            cache.set(key, payload, MENU_CACHE_TIMEOUT)
+        return Response(payload, status=status.HTTP_200_OK, headers={"ETag": etag})
 
     def create(self, request, *args, **kwargs):
         user = request.user
@@ -168,6 +421,14 @@ class MenuView(ListCreateAPIView):
         restaurant = get_object_or_404(
             Restaurants, pk=self.kwargs.get("pk"), owner=user
         )
+        if Menu.objects.filter(
+            restaurant=restaurant, name=request.data.get("name")
+        ).exists():
+            return Response(
+                {"msg": "You already have a menu item with this name", "status": False},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(restaurant=restaurant)
@@ -181,12 +442,144 @@ class MenuView(ListCreateAPIView):
         )
 
 
+# ---------------- MENU IMPORT ----------------
+
+
+@extend_schema(
+    request={
+        "multipart/form-data": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+        }
+    },
+    tags=["Menu"],
+)
+class MenuImportView(GenericAPIView):
+    """
+    Bulk menu import for owners.
+
+    POST:
+        Upload a ``.csv`` (with a header line) or ``.ndjson`` file as ``file``.
+        Rows are validated and upserted by name in batches; the response
+        reports how many items were created or updated, how many lines were
+        rejected and the errors for the first of them.
+    """
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    readers = {
+        ".csv": read_csv_rows,
+        ".ndjson": read_ndjson_rows,
+        ".jsonl": read_ndjson_rows,
+    }
+
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        if user.role != "owner":
+            return Response(
+                {"msg": "Only owners can import menu items", "status": False},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        restaurant = get_object_or_404(
+            Restaurants, pk=self.kwargs.get("pk"), owner=user
+        )
+        upload = request.FILES.get("file")
+        reader = None
+        if upload is not None:
+            extension = "." + upload.name.rpartition(".")[2].lower()
+            reader = self.readers.get(extension)
+        if reader is None:
+            return Response(
+                {"msg": "Upload a .csv or .ndjson file as 'file'", "status": False},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = import_menu(restaurant, reader(upload))
+        return Response(
+            {"msg": "Menu imported", "data": report, "status": True},
+            status=status.HTTP_200_OK,
+        )
+
+
+# ---------------- MENU BULK UPDATE ----------------
+
+
+@extend_schema(
+    request=MenuBulkUpdateSerializer(many=True),
+    responses=MenuBulkUpdateSerializer(many=True),
+    tags=["Menu"],
+)
+class MenuBulkUpdateView(GenericAPIView):
+    """
+    Bulk price, availability and stock changes for owners.
+
+    PATCH:
+        Takes a list of ``{"id": ..., "<field>": <value>}`` changes and applies
+        them all in one transaction, or none of them if any item is invalid
+        or does not belong to the restaurant.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = MenuBulkUpdateSerializer
+    max_changes = 500
+
+    def patch(self, request, *args, **kwargs):
+        user = request.user
+        if user.role != "owner":
+            return Response(
+                {"msg": "Only owners can update menu items", "status": False},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        restaurant = get_object_or_404(
+            Restaurants, pk=self.kwargs.get("pk"), owner=user
+        )
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {"msg": "Send a non-empty list of changes", "status": False},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(request.data) > self.max_changes:
+            return Response(
+                {
+                    "msg": f"Send at most {self.max_changes} changes at a time",
+                    "status": False,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        items, missing = update_menu_items(restaurant, serializer.validated_data)
+        if missing:
+            return Response(
+                {
+                    "msg": "Some menu items do not belong to this restaurant",
+                    "data": {"missing": missing},
+                    "status": False,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            {
+                "msg": "Menu items updated successfully",
+                "data": self.get_serializer(items, many=True).data,
+                "status": True,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 # ---------------- MENU DETAIL ----------------
 
 
 @extend_schema(tags=["Menu"])
-class MenuDetailView(RetrieveUpdateDestroyAPIView):
+class MenuDetailView(
+    CachedObjectMixin, ConditionalDetailMixin, RetrieveUpdateDestroyAPIView
+):
     permission_classes = [IsAuthenticated]
+    lookup_url_kwarg = "menu_pk"
 
     def get_serializer_class(self):
         return (
@@ -195,12 +588,15 @@ class MenuDetailView(RetrieveUpdateDestroyAPIView):
             else MenuDetailSerializer
         )
 
-    def get_object(self):
-        pk = self.kwargs.get("pk")
+    def get_queryset(self):
+        menu = Menu.objects.filter(restaurant_id=self.kwargs.get("pk"))
         user = self.request.user
         if user.role == "owner":
-            return get_object_or_404(Menu, pk=pk, restaurant__owner=user)
-        return get_object_or_404(Menu, pk=pk, is_available=True)
+            return menu.filter(restaurant__owner=user)
+        return menu.filter(is_available=True)
+
+    def get_validator_queryset(self):
+        return self.get_queryset().filter(pk=self.kwargs["menu_pk"])
 
     def retrieve(self, request, *args, **kwargs):
         response = super().retrieve(request, *args, **kwargs)